@@ -0,0 +1,103 @@
+from pathlib import Path
+from termcolor import colored
+from threading import Event, Thread
+from timeit import default_timer as timer
+from typing import Callable, Dict, List, Optional
+
+import parse_and_ground as pg
+from testset import TestSet
+
+# Anytime verification of the intermediate models reported by the solver while it optimizes.
+#
+# The solver (get_best_model.py, or the in-process clingo engine) dumps each intermediate model into
+# a folder as model_<index>.lp. A background thread verifies the latest dumped model over the test
+# set (older models still waiting are skipped, as they are superseded). If a model verifies over the
+# whole test set, the stop function is called to interrupt the solver, and the model is reported as
+# verified. The results for the verified files (up to the first failing one) are queued along with the
+# model, so that the driver doesn't verify them again if the model is the final (best) one; only the
+# results of the latest verified model are kept, as superseded models aren't the final one.
+
+class AnytimeVerifier:
+    def __init__(self, folder: Path, test_set: TestSet, ground_options: Dict, ignore_constants: bool, logger):
+        self.folder = folder
+        self.test_set = test_set
+        self.ground_options = ground_options
+        self.ignore_constants = ignore_constants
+        self.logger = logger
+        self.stop = None
+        self.done = Event()
+        self.thread = None
+        self.last_index = -1
+        self.verified = None
+        self.queued = []
+        self.num_verified_models = 0
+        self.verify_time = 0
+
+    def _latest_model(self) -> Optional[Path]:
+        models = sorted([ fname for fname in self.folder.iterdir() if fname.name[:6] == 'model_' and fname.suffix == '.lp' ])
+        return models[-1] if models else None
+
+    def _run(self) -> None:
+        while not self.done.is_set():
+            model = self._latest_model()
+            index = -1 if model is None else int(model.stem[6:])
+            if index <= self.last_index:
+                self.done.wait(0.5)
+                continue
+
+            self.last_index = index
+            start_time = timer()
+            model_text = model.read_text()
+            lifted_model = pg.read_lifted_model(model, self.logger, ignore_constants=self.ignore_constants)
+            failure, results = None, []
+            for result in self.test_set.verify(lifted_model, jobs=1, **self.ground_options):
+                results.append(dict(result, verify_time=0, model_index=index, model_text=model_text))
+                if result['unverified_nodes']:
+                    failure = result
+                    break
+                elif self.done.is_set():
+                    break
+            self.verify_time += timer() - start_time
+            self.num_verified_models += 1
+
+            self.queued = results
+            if failure is not None:
+                self.logger.info(f"Anytime: model #{index} fails on {failure['fname'].name} (#unverified_nodes={len(failure['unverified_nodes'])}); counterexamples queued")
+            elif len(results) == len(self.test_set):
+                self.logger.info(colored(f'Anytime: model #{index} verifies over test set; stopping solver', 'green', attrs=['bold']))
+                self.verified = model
+                if self.stop is not None:
+                    self.stop()
+                return
+
+    # Start verification of intermediate models; stop() is called to interrupt the solver
+    def start(self, stop: Optional[Callable] = None) -> None:
+        for fname in self.folder.iterdir():
+            fname.unlink()
+        self.stop = stop
+        self.done.clear()
+        self.last_index = -1
+        self.verified = None
+        self.queued = []
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # Wait for background verification to finish (the model being verified, if any, is abandoned
+    # at the next file); return verified model, if any
+    def finish(self) -> Optional[Path]:
+        self.done.set()
+        self.thread.join()
+        self.thread = None
+        return self.verified
+
+    # Return queued results of model (given by its text), in test-set order, and clear queue; results
+    # for other models are dropped
+    def pop_queued(self, model_text: str) -> List[Dict]:
+        queued, self.queued = self.queued, []
+        if queued and queued[0]['model_text'] != model_text:
+            self.logger.info(f"Anytime: dropped {len(queued)} queued result(s) of model #{queued[0]['model_index']}, as it isn't the final model")
+            return []
+        return queued
+
+    def stats(self) -> str:
+        return f'#verified_models={self.num_verified_models}, #queued={len(self.queued)}, verify_time={self.verify_time:.3f}'
@@ -0,0 +1,63 @@
+from tempfile import TemporaryDirectory
+from shutil import unpack_archive
+from timeit import default_timer as timer
+from pathlib import Path
+from termcolor import colored
+from typing import List
+import argparse
+import logging
+
+import parse_and_ground as pg
+
+# Time each parser on the test graphs contained in archive, checking that all parsers produce the
+# same distillate. Returns list of tuples (filename, size, times) where times is indexed by parser.
+def benchmark_archive(archive: Path, parsers: List[str], repeat: int, logger) -> List:
+    results = []
+    with TemporaryDirectory() as tmp_folder:
+        unpack_archive(archive, tmp_folder)
+        for fname in sorted(Path(tmp_folder).glob('*/test/*.lp')):
+            times, distillates = dict(), dict()
+            for parser in parsers:
+                elapsed_times = []
+                for _ in range(repeat):
+                    start_time = timer()
+                    distillates[parser] = pg.parse_graph_file(fname, logger, parser=parser)
+                    elapsed_times.append(timer() - start_time)
+                times[parser] = min(elapsed_times)
+            reference = distillates[parsers[0]]
+            for parser in parsers[1:]:
+                assert distillates[parser] == reference, f"{colored('ERROR:', 'red')} parsers '{parsers[0]}' and '{parser}' differ on '{fname.name}'"
+            results.append((fname.name, fname.stat().st_size, times))
+    return results
+
+def _parse_arguments():
+    default_archives = sorted(Path('graphs/solvable').glob('*.zip'))
+    default_repeat = 1
+    parser = argparse.ArgumentParser(description='Benchmark parsers for graph files')
+    parser.add_argument('archives', nargs='*', type=Path, default=default_archives, help='compressed domains to benchmark (default=graphs/solvable/*.zip)')
+    parser.add_argument('--repeat', type=int, default=default_repeat, help=f'number of repetitions per file; best time is reported (default={default_repeat})')
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    args = _parse_arguments()
+    logging.basicConfig(format='[%(levelname)s] %(message)s', level=logging.WARNING)
+    logger = logging.getLogger('benchmark')
+
+    # the legacy parser is the reference against which the other parsers are compared
+    parsers = [ 'legacy' ] + [ parser for parser in pg.GRAPH_PARSERS if parser != 'legacy' ]
+    totals = { parser: 0.0 for parser in parsers }
+    for archive in args.archives:
+        results = benchmark_archive(archive, parsers, args.repeat, logger)
+        archive_totals = { parser: sum([ times[parser] for _, _, times in results ]) for parser in parsers }
+        print(colored(f'{archive.name}:', 'red'))
+        for name, size, times in results:
+            speedups = [ f'{parser}={times[parser]:.3f}s (x{times["legacy"] / max(times[parser], 1e-9):.1f})' for parser in parsers ]
+            print(f'  {name}: size={size}, {", ".join(speedups)}')
+        speedups = [ f'{parser}={archive_totals[parser]:.3f}s (x{archive_totals["legacy"] / max(archive_totals[parser], 1e-9):.1f})' for parser in parsers ]
+        print(colored(f'  total: {", ".join(speedups)}', 'green'))
+        for parser in parsers: totals[parser] += archive_totals[parser]
+
+    speedups = [ f'{parser}={totals[parser]:.3f}s (x{totals["legacy"] / max(totals[parser], 1e-9):.1f})' for parser in parsers ]
+    print(colored(f'All archives: {", ".join(speedups)}', 'green', attrs=['bold']))
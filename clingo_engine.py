@@ -0,0 +1,136 @@
+from io import StringIO
+from pathlib import Path
+from termcolor import colored
+from timeit import default_timer as timer
+from typing import Dict, List, Optional, Tuple
+import re
+
+import parse_and_ground as pg
+from get_best_model import read_answer, output_best_model, dump_intermediate_model
+
+try:
+    import clingo
+except ImportError:
+    clingo = None
+
+# In-process solver engine based on the clingo Python API.
+#
+# The engine solves the same program as the subprocess engine, in the process of the driver: the lifted
+# model is built directly from the symbols of the best model, and the solve can be interrupted (e.g. by
+# the anytime verifier) without signals. best_model.lp and the readable models are still written, but
+# only as outputs for the user.
+#
+# The engine isn't a performance option: it grounds as much as the subprocess engine. The solver
+# program isn't an incremental encoding; e.g., action/1 and a_arity/2 are defined from the facts of
+# all graph files, so the program can't be grounded one graph file at a time (clingo can't redefine
+# atoms grounded in previous steps), and relevant nodes can't be externals without grounding the
+# program for every node of partial instances. Hence, a new control object is grounded for each call
+# whose files (or their contents) differ from the ones of the previous call.
+
+ENGINES = ['api', 'subprocess']
+
+RELEVANT_REGEX = re.compile(r'relevant\((\d+),(\d+)\)\.')
+
+LIFTED_MODEL_SIGNATURES = set([ ('a_arity', 2), ('pred', 1), ('eff', 3), ('prec', 3), ('constant', 1) ])
+
+def available() -> bool:
+    return clingo is not None
+
+def _symbol_value(symbol):
+    if symbol.type == clingo.SymbolType.Number:
+        return symbol.number
+    elif symbol.type == clingo.SymbolType.String:
+        return symbol.string
+    elif symbol.name == '':
+        return tuple([ _symbol_value(arg) for arg in symbol.arguments ])
+    else:
+        assert not symbol.arguments, f'Unexpected symbol {symbol}'
+        return symbol.name
+
+# Records of lifted model (see pg.lifted_model_from_records) for the symbols of a model
+def lifted_model_records(symbols) -> List[tuple]:
+    records = []
+    for symbol in symbols:
+        if symbol.type == clingo.SymbolType.Function and (symbol.name, len(symbol.arguments)) in LIFTED_MODEL_SIGNATURES:
+            records.append(tuple([ symbol.name ] + [ _symbol_value(arg) for arg in symbol.arguments ]))
+    return records
+
+# Split partial file into relevant nodes and remaining (structural) facts
+def read_partial_file(partial_fname: Path) -> Tuple[List[Tuple[int, int]], List[str]]:
+    relevant, facts = [], []
+    if partial_fname.exists():
+        with partial_fname.open('r') as fd:
+            for line in fd:
+                line = line.strip()
+                match = RELEVANT_REGEX.fullmatch(line)
+                if match:
+                    relevant.append((int(match.group(1)), int(match.group(2))))
+                elif line and line not in facts:
+                    facts.append(line)
+    return relevant, facts
+
+class ClingoEngine:
+    def __init__(self, arguments: List[str], logger):
+        assert available(), 'Python module clingo is not available'
+        self.arguments = arguments
+        self.logger = logger
+        self.control = None
+        self.key = None
+        self.num_controls = 0
+        self.interrupted = False
+
+    def _new_control(self, solver: Path, files: List[Path]) -> None:
+        self.control = None
+        self.control = clingo.Control(self.arguments)
+        for fname in [ solver ] + files:
+            self.control.load(str(fname))
+        self.control.ground([ ('base', []) ])
+        self.num_controls += 1
+
+    # Interrupt ongoing solve (it can be called from other threads)
+    def interrupt(self) -> None:
+        self.interrupted = True
+
+    # Solve program given by solver and files. The best model is stored in best_model_filename (and appended to readable_models_filename) as
+    # done by get_best_model.py, and intermediate models are dumped into intermediate_folder (if
+    # given). Returns dict with fields ground_time, solve_time, status, cost, and lifted_model (None if
+    # no model was found).
+    def solve(self, solver: Path, files: List[Path], max_time: int, best_model_filename: Path, readable_models_filename: Optional[Path], intermediate_folder: Optional[Path] = None) -> Dict:
+        start_time = timer()
+        self.interrupted = False
+        key = (str(solver), tuple([ (str(fname), fname.stat().st_mtime_ns) for fname in files ]))
+        if key != self.key:
+            self._new_control(solver, files)
+            self.key = key
+            self.logger.info(f'Clingo engine: new control #{self.num_controls}, #files={1 + len(files)}')
+        ground_time = timer() - start_time
+
+        # solve asynchronously, so that the time limit is enforced and ctrl-C is honored
+        start_time = timer()
+        best = dict(symbols=None, cost=[], index=0)
+        def on_model(model):
+            best.update(symbols=model.symbols(shown=True), cost=model.cost, index=best['index'] + 1)
+            if intermediate_folder is not None:
+                dump_intermediate_model(read_answer(' '.join([ str(symbol) for symbol in best['symbols'] ])), intermediate_folder, best['index'])
+        with self.control.solve(on_model=on_model, async_=True) as handle:
+            while not handle.wait(1.0):
+                if max_time > 0 and timer() - start_time > max_time:
+                    self.logger.info(colored(f'Clingo engine: time limit of {max_time} second(s) reached', 'magenta'))
+                    handle.cancel()
+                elif self.interrupted:
+                    self.logger.info(colored(f'Clingo engine: solve interrupted', 'magenta'))
+                    handle.cancel()
+            status = str(handle.get())
+        solve_time = timer() - start_time
+
+        answer, lifted_model = None, None
+        if best['symbols'] is not None:
+            lifted_model = pg.lifted_model_from_records(lifted_model_records(best['symbols']), self.logger)
+            answer = read_answer(' '.join([ str(symbol) for symbol in best['symbols'] ]))
+            if best['cost']:
+                answer.set_optimization('Optimization: ' + ' '.join([ str(n) for n in best['cost'] ]))
+        output = StringIO()
+        output_best_model(answer, best_model_filename, readable_models_filename, fd=output)
+        for line in output.getvalue().split('\n'):
+            self.logger.info(line)
+        return dict(ground_time=ground_time, solve_time=solve_time, status=status, cost=best['cost'], lifted_model=lifted_model)
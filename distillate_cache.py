@@ -0,0 +1,156 @@
+from hashlib import sha256
+from itertools import compress
+from pathlib import Path
+from shutil import rmtree
+from typing import Dict, List
+from termcolor import colored
+from timeit import default_timer as timer
+import numpy as np
+import os
+
+import parse_and_ground as pg
+from symbols import SYMBOLS
+
+# Persistent cache of distillates (parsed graph files).
+#
+# Each entry is a folder named after the SHA-256 hash of the graph file content, the parser version,
+# and the cache version; hence, an entry is automatically invalidated when the graph file changes.
+# The folder contains one .npy file per array in the encoding of the distillate, where all strings
+# (feature names, objects, labels) are interned into integers that index the 'symbols' array, and
+# ground atoms are interned into integers that index the CSR structure ('atom_pred', 'atom_args_ptr',
+# 'atom_args'). Entries are independent of the shared symbol table SYMBOLS used in distillates: names
+# are translated when encoding, and interned back when decoding. The arrays are loaded memory-mapped.
+
+CACHE_VERSION = 1
+
+def file_hash(filename: Path) -> str:
+    digest = sha256()
+    with filename.open('rb') as fd:
+        for chunk in iter(lambda: fd.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(filename: Path) -> str:
+    return f'{file_hash(filename)}_p{pg.PARSER_VERSION}_c{CACHE_VERSION}'
+
+# Encode distillate as dictionary of integer arrays (plus array of symbols)
+def encode_distillate(distillate: Dict) -> Dict[str, np.ndarray]:
+    symbols, symbols_r = dict(), []
+    def intern(symbol: str) -> int:
+        if symbol not in symbols:
+            symbols[symbol] = len(symbols_r)
+            symbols_r.append(symbol)
+        return symbols[symbol]
+
+    atoms, atom_pred, atom_args_ptr, atom_args = dict(), [], [ 0 ], []
+    def intern_atom(atom: int) -> int:
+        if atom not in atoms:
+            pred, args = SYMBOLS.atom_r_names(atom)
+            atoms[atom] = len(atom_pred)
+            atom_pred.append(intern(pred))
+            atom_args.extend([ intern(arg) for arg in args ])
+            atom_args_ptr.append(len(atom_args))
+        return atoms[atom]
+
+    node = [ (inst, n) for inst, nodes in distillate['node'].items() for n in nodes ]
+    tlabel = [ (inst, intern(label), src, dst) for inst, tlabels in distillate['tlabel'].items() for label, edges in tlabels.items() for (src, dst) in edges ]
+    constant = [ (inst, intern(SYMBOLS.name(const))) for inst, consts in distillate['constant'].items() for const in consts ]
+    f_static = [ (inst, intern(SYMBOLS.name(feature))) for inst, features in distillate['f_static'].items() for feature in features ]
+    fval_static = [ (inst, intern_atom(atom), value) for inst, fvals in distillate['fval_static'].items() for value in [0, 1] for atom in fvals[value] ]
+    fval = [ (inst, intern_atom(atom), n, value) for inst, fvals in distillate['fval'].items() for n, atoms_with_value in fvals['node'].items() for (atom, value) in atoms_with_value ]
+    feature = [ (intern(feature), arity) for feature, arity in distillate['feature'].items() ]
+    complexity = [ (intern(feature), complexity) for feature, complexity in distillate['complexity'].items() ]
+
+    def as_array(rows: List[tuple], width: int) -> np.ndarray:
+        return np.array(rows, dtype=np.int32).reshape(len(rows), width)
+
+    return dict(symbols=np.array(symbols_r, dtype=str),
+                atom_pred=np.array(atom_pred, dtype=np.int32),
+                atom_args_ptr=np.array(atom_args_ptr, dtype=np.int32),
+                atom_args=np.array(atom_args, dtype=np.int32),
+                node=as_array(node, 2),
+                tlabel=as_array(tlabel, 4),
+                constant=as_array(constant, 2),
+                f_static=as_array(f_static, 2),
+                fval_static=as_array(fval_static, 3),
+                fval=as_array(fval, 4),
+                feature=as_array(feature, 2),
+                complexity=as_array(complexity, 2))
+
+# Decode distillate from its encoding; graph_filename is set to given filename
+def decode_distillate(arrays: Dict[str, np.ndarray], filename: Path) -> Dict:
+    names = arrays['symbols'].tolist()
+    symbols = [ SYMBOLS.symbol(name) for name in names ]
+    atom_pred = arrays['atom_pred'].tolist()
+    atom_args_ptr = arrays['atom_args_ptr'].tolist()
+    atom_args = [ symbols[i] for i in arrays['atom_args'].tolist() ]
+    atoms = [ SYMBOLS.atom(symbols[atom_pred[i]], tuple(atom_args[atom_args_ptr[i]:atom_args_ptr[i+1]])) for i in range(len(atom_pred)) ]
+
+    distillate = pg._new_distillate(filename)
+    for inst, n in arrays['node'].tolist():
+        pg._add_node(distillate, inst, n)
+    for inst, label, src, dst in arrays['tlabel'].tolist():
+        pg._add_tlabel(distillate, inst, names[label], (src, dst))
+    for inst, const in arrays['constant'].tolist():
+        pg._add_constant(distillate, inst, symbols[const])
+    for inst, feature in arrays['f_static'].tolist():
+        pg._add_f_static(distillate, inst, symbols[feature])
+    for inst, atom, value in arrays['fval_static'].tolist():
+        pg._add_fval(distillate, inst, atoms[atom], None, value)
+
+    # valuations for dynamic predicates are stored contiguously per (inst, node) in the order of the
+    # node lists of the distillate, so they are decoded in bulk, one segment of rows per node
+    fval = arrays['fval']
+    if len(fval) > 0:
+        insts = fval[:,0]
+        for inst in dict.fromkeys(insts.tolist()):
+            rows = fval[insts == inst]
+            objs = [ atoms[i] for i in rows[:,1].tolist() ]
+            nodes, values = rows[:,2], rows[:,3]
+            pairs = list(zip(objs, nodes.tolist()))
+            fvals = { 0: set(compress(pairs, (values == 0).tolist())), 1: set(compress(pairs, (values == 1).tolist())), 'node': dict() }
+            bounds = [ 0 ] + (np.flatnonzero(np.diff(nodes)) + 1).tolist() + [ len(rows) ]
+            nodes, values = nodes.tolist(), values.tolist()
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                fvals['node'][nodes[start]] = list(zip(objs[start:end], values[start:end]))
+            distillate['fval'][inst] = fvals
+
+    for feature, arity in arrays['feature'].tolist():
+        distillate['feature'][names[feature]] = arity
+    for feature, complexity in arrays['complexity'].tolist():
+        distillate['complexity'][names[feature]] = complexity
+    return distillate
+
+def store_entry(entry: Path, arrays: Dict[str, np.ndarray]) -> None:
+    # write arrays in temporary folder which is then renamed, so that entries are never partially written
+    tmp_entry = entry.with_name(f'{entry.name}.tmp{os.getpid()}')
+    tmp_entry.mkdir(parents=True, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(tmp_entry / f'{name}.npy', array, allow_pickle=False)
+    try:
+        tmp_entry.rename(entry)
+    except OSError:
+        # entry stored concurrently by other process
+        rmtree(tmp_entry, ignore_errors=True)
+
+def load_entry(entry: Path) -> Dict[str, np.ndarray]:
+    return { fname.stem: np.load(fname, mmap_mode='r', allow_pickle=False) for fname in entry.iterdir() if fname.suffix == '.npy' }
+
+# Return distillate for graph file, from cache if available. Otherwise, the graph file is parsed and
+# its distillate is stored in the cache.
+def load_distillate(filename: Path, cache_path: Path, logger, parser: str = 'regex') -> Dict:
+    start_time = timer()
+    entry = cache_path / cache_key(filename)
+    if entry.is_dir():
+        try:
+            distillate = decode_distillate(load_entry(entry), filename)
+            logger.info(f"Distillate for '{filename}' loaded from cache entry {entry.name}, elapsed_time={timer() - start_time:.3f}")
+            return distillate
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            logger.warning(colored(f"Invalid cache entry {entry} for '{filename}' ({e}); parsing file", 'magenta'))
+            rmtree(entry, ignore_errors=True)
+
+    distillate = pg.parse_graph_file(filename, logger, parser=parser)
+    store_entry(entry, encode_distillate(distillate))
+    logger.info(f"Distillate for '{filename}' stored in cache entry {entry.name}, elapsed_time={timer() - start_time:.3f}")
+    return distillate
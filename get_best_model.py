@@ -1,6 +1,10 @@
 from sys import stdin, stdout, argv
 from pathlib import Path
 import termcolor
+import os, signal
+
+# Max length of echoed lines of atoms
+MAX_ECHO_LENGTH = 2048
 
 def colored(text, color, attrs=None, use_colors=True):
     return termcolor.colored(text, color=color, attrs=attrs) if use_colors else text
@@ -222,27 +226,63 @@ def read_answer(line):
     answer.set_static_preconditions()
     return answer
 
+# Dump atoms of intermediate model into file model_<index>.lp in folder; the file is written under a
+# temporary name and then renamed, so readers never see a partial model
+def dump_intermediate_model(answer, folder, index):
+    filename = Path(folder) / f'model_{index:06d}.lp'
+    tmp_filename = Path(folder) / f'.model_{index:06d}.tmp'
+    answer.dump(tmp_filename)
+    os.replace(tmp_filename, filename)
+
+# Print best model (if any), dump its atoms into filename, and append it to pprint_filename
+def output_best_model(answer, filename, pprint_filename=None, fd=stdout):
+    if answer is not None:
+        print('\n' + colored('Best model:', 'red'), file=fd)
+        answer.print(2, fd=fd)
+        answer.dump(filename)
+        answer.print_appl(2, fd=fd)
+        if pprint_filename:
+            with Path(pprint_filename).open('a') as pfd:
+                print('', file=pfd)
+                answer.print(2, use_colors=False, fd=pfd)
+                answer.print_appl(2, use_colors=False, fd=pfd)
+    else:
+        print('\n' + colored('No model found', 'red'), file=fd)
+    print('\n', end='', file=fd)
+
 if __name__ == '__main__':
     if len(argv) < 2:
-        print(f'Usage: {argv[0]} <filename> [<filename>]')
+        print(f'Usage: {argv[0]} <filename> [<filename> [<folder>]]')
         exit(-1)
     filename = argv[1]
     pprint_filename = None if len(argv) < 3 else argv[2]
+    intermediate_folder = None if len(argv) < 4 else argv[3]
 
-    # read/print input lines
-    lines = []
-    for line in stdin:
-        print(line, end='')
-        lines.append(line.strip('\n'))
+    # with folder for intermediate models, the solver may be stopped with SIGINT sent to the process
+    # group; this process must survive it to report the last model
+    if intermediate_folder:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
 
-    # read answer sets and final statistics
-    answers = []
+    # read input lines one at a time, keeping only the latest answer (line of atoms and optimization
+    # line), which is parsed when the input ends; each intermediate answer is dumped as soon as its
+    # optimization line is read. Lines are echoed, with lines of atoms truncated to MAX_ECHO_LENGTH
+    last_answer = None
+    atoms, index, expect = None, 0, None
     stats = dict(num_models=0, optimun=0, optimization=[], calls=0, time='', cpu_time='')
-    for i, line in enumerate(lines):
-        if line[:7] == 'Answer:':
-            answer = read_answer(lines[i+1])
-            answer.set_optimization(lines[i+2])
-            answers.append(answer)
+    for line in stdin:
+        line = line.strip('\n')
+        if expect == 'atoms':
+            print(line if len(line) <= MAX_ECHO_LENGTH else f'{line[:MAX_ECHO_LENGTH]} ... [{len(line.split(" "))} atom(s)]')
+            atoms, expect = line, 'optimization'
+            continue
+
+        print(line)
+        if expect == 'optimization':
+            last_answer, expect = (atoms, line), None
+            if intermediate_folder:
+                dump_intermediate_model(read_answer(atoms), intermediate_folder, index)
+        elif line[:7] == 'Answer:':
+            index, expect = int(line.split()[1]), 'atoms'
         elif line[:14] == 'Models       :':
             stats['num_models'] = line[15:]
         elif line[:14] == '  Optimum    :':
@@ -257,18 +297,11 @@ if __name__ == '__main__':
             stats['cpu_time'] = line[15:]
     #print(f"\n{colored('Stats: ', 'red')}{stats}")
 
+    answer = None
+    if last_answer is not None:
+        answer = read_answer(last_answer[0])
+        answer.set_optimization(last_answer[1])
+
     # print best model
-    if answers:
-        print('\n' + colored('Best model:', 'red'))
-        answers[-1].print(2)
-        answers[-1].dump(filename)
-        answers[-1].print_appl(2)
-        if pprint_filename:
-            with Path(pprint_filename).open('a') as fd:
-                print('', file=fd)
-                answers[-1].print(2, use_colors=False, fd=fd)
-                answers[-1].print_appl(2, use_colors=False, fd=fd)
-    else:
-        print('\n' + colored('No model found', 'red'))
-    print('\n', end='')
+    output_best_model(answer, filename, pprint_filename)
 
@@ -10,11 +10,19 @@ from termcolor import colored
 from typing import List, Tuple, Optional, Dict
 from copy import deepcopy
 from math import ceil, floor
-import signal, argparse, re, random
+from os import cpu_count
+import signal, argparse, re, random, os, json, pickle
 import logging
 
+import clingo_engine as ce
+import portfolio as pf
 import parse_and_ground as pg
-from verifier import verify_ground_model
+import result_cache as rc
+import pregrounding as pgr
+import prefilter as pfl
+from symbols import SYMBOLS
+from testset import TestSet
+from anytime_verifier import AnytimeVerifier
 
 def rm_tree(path: Path, logger) -> None:
     for child in path.iterdir():
@@ -71,20 +79,23 @@ def get_lp_files(path: Path, exclude_regexes: List[str] = []) -> List[str]:
         files = [ fname for fname in files if not re.match(regex, fname.name) ]
     return sorted(files)
 
-def size_lp_file(fname: Path) -> int:
-    size = 0
-    with fname.open('r') as fd:
-        for line in fd:
-            if line[:5] == 'node(':
-                size += 1
-    return size
+# Load Clingo configuration produced by tune_clingo.py
+def load_clingo_config(filename: Path) -> Dict:
+    with filename.open('r') as fd:
+        config = json.load(fd)
+    assert 'threads' in config and 'options' in config, f"Invalid Clingo configuration in '{filename}'"
+    return config
 
-def sort_lp_files_by_size(files: List[Path]) -> List[Path]:
-    files_with_size = [ (size_lp_file(fname), fname) for fname in files ]
-    files_with_size.sort(key=lambda pair: pair[0])
-    return [ fname for _, fname in files_with_size ]
+# Send SIGINT to the process group of the solver pipeline, so that clingo reports its last model
+def interrupt_process_group(p: Popen) -> None:
+    try:
+        os.killpg(p.pid, signal.SIGINT)
+    except ProcessLookupError:
+        pass
 
-def add_nodes_to_partial_lp_file(partial_fname: Path, fnames: dict, unsolved_nodes: List[Tuple], max_nodes_per_iteration: int, logger):
+# Add unsolved nodes to partial.lp; if representatives of nodes in the bisimulation quotient of the
+# instances are given, their representatives (one per block) are added instead
+def add_nodes_to_partial_lp_file(partial_fname: Path, fnames: dict, unsolved_nodes: List[Tuple], max_nodes_per_iteration: int, logger, representatives: Optional[Dict] = None):
     added_nodes = []
     insts = set([ inst for (inst, node) in unsolved_nodes ])
     with partial_fname.open('a') as fd:
@@ -93,7 +104,7 @@ def add_nodes_to_partial_lp_file(partial_fname: Path, fnames: dict, unsolved_nod
             fname = fnames[inst]
             fd.write(f'filename("{fname.name}").\n')
             fd.write(f'partial({inst},"{fname.name}").\n')
-            nodes = [ node for (i, node) in unsolved_nodes if i == inst ]
+            nodes = pg.representative_nodes(representatives, inst, [ node for (i, node) in unsolved_nodes if i == inst ])
             n = max_nodes_per_iteration if max_nodes_per_iteration > 0 else len(nodes)
             random.shuffle(nodes)
             logger.info(f'add_nodes_to_partial_lp_file: inst={inst}, nodes={nodes}, max_nodes_per_iteration={max_nodes_per_iteration}')
@@ -103,14 +114,74 @@ def add_nodes_to_partial_lp_file(partial_fname: Path, fnames: dict, unsolved_nod
                 added_nodes.append((inst, node))
     return added_nodes
 
-def add_new_instance(inst: int, fname: Path, solve_path: Path, distillate: Optional[Dict] = None, logger = None):
-    if distillate is None:
+# Add test file to solve path: a copy of the file, the (noisy) distillate, or the neighbourhood
+# subgraph of the distillate for the relevant nodes of the instance (if relevant is given)
+def add_new_instance(inst: int, fname: Path, solve_path: Path, distillate: Optional[Dict] = None, relevant: Optional[set] = None, logger = None):
+    if relevant is not None:
+        subgraph = pg.neighbourhood_subgraph(distillate, { inst: relevant })
+        logger.info(f"Write subgraph from '{distillate['graph_filename']}' to {solve_path}: #relevant={len(relevant)}, #nodes={len(subgraph['node'][inst])}/{len(distillate['node'][inst])}")
+        pg.write_graph_file_from_distillate(solve_path / fname.name, subgraph, logger)
+    elif distillate is None:
         logger.info(f'File copy {fname} to {solve_path}')
         file_copy(fname, solve_path)
     else:
         logger.info(f"Write distillate from '{distillate['graph_filename']}' to {solve_path}")
         pg.write_graph_file_from_distillate(solve_path / fname.name, distillate, logger)
 
+# Domain heuristics to warm start the solver from the best model: its chosen predicates, action
+# arities, preconditions and effects are decided first, and to true (requires --heuristic=Domain).
+# The previous optimum is only a lower bound for the next iteration (which has more relevant nodes),
+# so no bound is given to the solver.
+WARM_START_PREFIXES = ( 'pred(', 'a_arity(', 'prec(', 'eff(' )
+
+def write_warm_start_heuristics(filename: Path, best_model_filename: Path, logger) -> None:
+    num_heuristics = 0
+    with best_model_filename.open('r') as fd, filename.open('w') as heuristics_fd:
+        heuristics_fd.write(f'% Warm start from {best_model_filename}\n')
+        for line in fd:
+            atom = line.strip()
+            if atom.startswith(WARM_START_PREFIXES) and atom[-1] == '.':
+                heuristics_fd.write(f'#heuristic {atom[:-1]}. [1,true]\n')
+                num_heuristics += 1
+    logger.info(f'Warm start: {num_heuristics} heuristic(s) written to {filename}')
+
+# Version of checkpoints; it must be increased whenever the state stored in checkpoints changes
+CHECKPOINT_VERSION = 1
+
+# Write checkpoint of the state of the learning loop; it is written into a temporary file that is then
+# renamed, so that an interrupted run never leaves a partial checkpoint
+def write_checkpoint(filename: Path, checkpoint: Dict, logger) -> None:
+    start_time = timer()
+    tmp_filename = filename.with_name(f'.{filename.name}.tmp')
+    with tmp_filename.open('wb') as fd:
+        pickle.dump(dict(checkpoint, version=CHECKPOINT_VERSION), fd, protocol=pickle.HIGHEST_PROTOCOL)
+        fd.flush()
+        os.fsync(fd.fileno())
+    os.replace(tmp_filename, filename)
+    logger.info(f"Checkpoint written to {filename}: iteration={checkpoint['iterations']}, elapsed_time={timer() - start_time:.3f}")
+
+# Read checkpoint written by write_checkpoint; returns None if there is no valid checkpoint
+def read_checkpoint(filename: Path, logger) -> Optional[Dict]:
+    if not filename.exists():
+        logger.warning(colored(f'No checkpoint {filename} to continue from; starting from files in solve path', 'magenta'))
+        return None
+    with filename.open('rb') as fd:
+        checkpoint = pickle.load(fd)
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        logger.warning(colored(f"Checkpoint {filename} has version {checkpoint.get('version')} but {CHECKPOINT_VERSION} is expected; ignoring it", 'magenta'))
+        return None
+    logger.info(f"Checkpoint read from {filename}: iteration={checkpoint['iterations']}")
+    return checkpoint
+
+# Test files in checkpoint are moved to test path (compressed domains are unpacked in a different
+# temporary folder in each run)
+def rebase_test_files(checkpoint: Dict, test_path: Path) -> None:
+    checkpoint['data']['fnames'] = { inst: test_path / fname.name for inst, fname in checkpoint['data']['fnames'].items() }
+    checkpoint['added_files'] = [ (inst, test_path / fname.name) for (inst, fname) in checkpoint['added_files'] ]
+    for inst, distillate in checkpoint['subgraph_distillates'].items():
+        if distillate is not None:
+            distillate['graph_filename'] = test_path / distillate['graph_filename'].name
+
 def add_noise_to_distillate(distillate: Dict, noise: float, scope: int, ground_atoms: Dict, logger) -> Dict:
     assert 'fval' in distillate
     assert 'unknown' not in distillate
@@ -130,13 +201,16 @@ def add_noise_to_distillate(distillate: Dict, noise: float, scope: int, ground_a
     # add noise to each instance in distillate:
     #   scope = 0: set to 'unknown'  noise% of true atoms, per state
     #   scope = 1: set to 'unknown'  noise% of all atoms, per state
+    # atoms are interned, and nullary atoms in ground_atoms (with empty args) are mapped back to the
+    # form used in distillates (with args ('null',))
+    null = SYMBOLS.symbol('null')
     num_unknowns = 0
     for inst in distillate['fval']:
         assert inst in ground_atoms
         assert inst in distillate['f_static']
         static_atoms = distillate['f_static'][inst]
-        datoms = [(pred, args) for (pred, args) in ground_atoms[inst].keys() if pred not in static_atoms]
-        datoms = [(pred, args) if args != () else (pred, ('null',)) for (pred, args) in datoms]
+        datoms = [ SYMBOLS.atoms_r[atom] for atom in ground_atoms[inst].keys() ]
+        datoms = [ SYMBOLS.atom(pred, args if args != () else (null,)) for (pred, args) in datoms if pred not in static_atoms ]
         datoms_set = set(datoms)
 
         for node in distillate['fval'][inst]['node']:
@@ -189,7 +263,29 @@ def solve(solver: Path,
           sat_prepro: int,
           include: List[Path],
           noise: float,
-          noise_scope: int) -> bool:
+          noise_scope: int,
+          parser: str,
+          distillate_cache: Optional[Path],
+          min_free_memory: int,
+          node_repr: str,
+          appl_engine: str,
+          grounding: str,
+          verify_jobs: int,
+          max_files_per_iteration: int,
+          engine: str,
+          anytime: bool,
+          portfolio: int,
+          portfolio_stats_filename: Path,
+          clingo_config: Optional[Dict],
+          record_inputs: Optional[Path],
+          subgraph: bool,
+          bisimulation_stats: Optional[Dict],
+          continue_solve: bool,
+          warm_start: bool,
+          result_cache: Optional[Path],
+          result_cache_size: int,
+          preground: Optional[Path],
+          prefilter: bool) -> bool:
     # start clock
     start_time = timer()
 
@@ -198,11 +294,14 @@ def solve(solver: Path,
     train_path = domain / 'train'
     test_path = domain / 'test'
     partial_fname = solve_path / 'partial.lp'
+    checkpoint_fname = solve_path / 'checkpoint.pkl'
+    heuristics_fname = solve_path / 'warm_start.lp'
     logger.info(f'Params: solver={solver}, task={task_name}, train_path={train_path}, best_model_filename={best_model_filename}, solution_filename={solution_filename}')
 
     # calculate model using solve set
     iterations = 0
     num_added_nodes = []
+    batches = []
     num_unknowns = []
     added_files = []
     calculate_model = True
@@ -210,6 +309,7 @@ def solve(solver: Path,
     solver_wall_times = []
     solver_ground_times = []
     solver_cpu_times = []
+    solver_warm_starts = []
     verify_times_batches = []
 
     # data for checking whether trapped in infinite loop, dictionary with fields:
@@ -220,85 +320,337 @@ def solve(solver: Path,
     # - fnames: dict() that maps inst to filenames
     data = dict(log=[], already_added=set(), sink_nodes=dict(), eq_classes=dict(), fnames=dict())
 
+    # (noisy) distillates of test files added as neighbourhood subgraphs, indexed by inst; None stands
+    # for the distillate in the test set
+    subgraph_distillates = dict()
+
+    # if graphs are reduced (bisimulation_stats isn't None), test files are added as bisimulation
+    # quotients; verification is over the original graphs, and representatives maps each inst to the
+    # map from its nodes to their representatives in the quotient
+    representatives = dict()
+
+    # restore state of interrupted run from its checkpoint, written at the end of each iteration; the
+    # files in solve path are brought back to the state in the checkpoint
+    checkpoint = read_checkpoint(checkpoint_fname, logger) if continue_solve and not verify_only else None
+    if checkpoint is not None:
+        SYMBOLS.restore(checkpoint['symbols'])
+        random.setstate(checkpoint['random_state'])
+        rebase_test_files(checkpoint, test_path)
+        iterations = checkpoint['iterations']
+        num_added_nodes = checkpoint['num_added_nodes']
+        batches = checkpoint['batches']
+        num_unknowns = checkpoint['num_unknowns']
+        added_files = checkpoint['added_files']
+        solver_times_raw = checkpoint['solver_times_raw']
+        solver_wall_times = checkpoint['solver_wall_times']
+        solver_ground_times = checkpoint['solver_ground_times']
+        solver_cpu_times = checkpoint['solver_cpu_times']
+        solver_warm_starts = checkpoint['solver_warm_starts']
+        verify_times_batches = checkpoint['verify_times_batches']
+        data = checkpoint['data']
+        subgraph_distillates = checkpoint['subgraph_distillates']
+        representatives = checkpoint['representatives']
+        if bisimulation_stats is not None and checkpoint['bisimulation_stats'] is not None:
+            bisimulation_stats.update(checkpoint['bisimulation_stats'])
+        start_time = timer() - checkpoint['elapsed_time']
+
+        if checkpoint['partial'] is not None:
+            partial_fname.write_text(checkpoint['partial'])
+        elif partial_fname.exists():
+            partial_fname.unlink()
+        added_names = set([ fname.name for (inst, fname) in added_files ])
+        for fname in get_lp_files(test_path):
+            if fname.name not in added_names and (solve_path / fname.name).exists():
+                logger.info(f'Unlink {solve_path / fname.name} added after checkpoint')
+                (solve_path / fname.name).unlink()
+        logger.info(colored(f'Continuing from checkpoint at iteration {iterations}: added_files={added_files}, #already_added={len(data["already_added"])}', 'blue', attrs=['bold']))
+
     # setup solver command
-    solver_cmd_args = dict(max_time=max_time, max_action_arity=max_action_arity, max_num_predicates=max_num_predicates, solver=solver, best_model_filename=best_model_filename, readable_models_filename=readable_models_filename, sat_prepro=sat_prepro)
-    solver_cmd_template = 'clingo -c max_action_arity={max_action_arity} -c num_predicates={max_num_predicates} --fast-exit -t 6 --sat-prepro={sat_prepro} --time-limit={max_time} --stats=0 {solver} {files} | python3 get_best_model.py {best_model_filename} {readable_models_filename}'
+    solver_cmd_args = dict(max_time=max_time, max_action_arity=max_action_arity, max_num_predicates=max_num_predicates, solver=solver, best_model_filename=best_model_filename, readable_models_filename=readable_models_filename, threads=6, options=f'--sat-prepro={sat_prepro}')
+    solver_cmd_template = 'clingo -c max_action_arity={max_action_arity} -c num_predicates={max_num_predicates} --fast-exit -t {threads} {options} --time-limit={max_time} --stats=0 {solver} {files} | python3 get_best_model.py {best_model_filename} {readable_models_filename}'
+    if clingo_config is not None:
+        logger.info(f"Clingo configuration: threads={clingo_config['threads']}, options='{clingo_config['options']}'")
+        solver_cmd_args.update(threads=clingo_config['threads'], options=clingo_config['options'])
+
+    # setup portfolio of configurations raced in each iteration; the configured threads (at most one per
+    # cpu) are split among them, and at most one configuration is raced per thread
+    configurations = []
+    if portfolio > 0:
+        portfolio_threads = min(solver_cmd_args['threads'], cpu_count() or 1)
+        if portfolio > portfolio_threads:
+            logger.warning(colored(f'Portfolio: racing {portfolio_threads} configuration(s) instead of {portfolio}, as there are {portfolio_threads} thread(s)', 'magenta'))
+        portfolio_stats = pf.load_stats(portfolio_stats_filename)
+        configurations = pf.select_configurations(pf.PORTFOLIO, portfolio_stats, min(portfolio, portfolio_threads))
+        portfolio_threads = portfolio_threads // len(configurations)
+        portfolio_folder = TemporaryDirectory(prefix='portfolio_')
+        logger.info(f'Portfolio: configurations={configurations}, threads={portfolio_threads} per configuration, stats={portfolio_stats_filename}')
+        if engine != 'subprocess' or anytime:
+            logger.warning(colored('Portfolio is raced with subprocess engine and without anytime verification', 'magenta'))
+            engine, anytime = 'subprocess', False
+
+    # warm start with domain heuristics from best model of previous iteration
+    if warm_start:
+        solver_cmd_args.update(options=solver_cmd_args['options'] + ' --heuristic=Domain')
+        configurations = [ f'{config} --heuristic=Domain' for config in configurations ]
+
+    # setup in-process clingo engine (falls back to subprocess if clingo module isn't available)
+    clingo_engine = None
+    if engine == 'api':
+        if ce.available():
+            clingo_engine = ce.ClingoEngine([ '-c', f'max_action_arity={max_action_arity}', '-c', f'num_predicates={max_num_predicates}', '-t', str(solver_cmd_args['threads']) ] + solver_cmd_args['options'].split(), logger)
+        else:
+            logger.warning(colored('Python module clingo not available; using subprocess engine', 'magenta'))
+
+    # setup cache of solver results, keyed by the inputs of the solver and the arguments below; results
+    # of raced or anytime solves depend on timing, and they aren't cached
+    if result_cache is not None and (configurations or anytime):
+        logger.warning(colored('Result cache is not used with portfolio or anytime verification', 'magenta'))
+        result_cache = None
+    if result_cache is not None:
+        result_cache.mkdir(parents=True, exist_ok=True)
+        cache_arguments = [ f'max_action_arity={max_action_arity}', f'num_predicates={max_num_predicates}', f"threads={solver_cmd_args['threads']}", f"options={solver_cmd_args['options']}", f'max_time={max_time}' ]
+        logger.info(f'Result cache: path={result_cache}, max_size={result_cache_size}MB, arguments={cache_arguments}')
+
+    # graph files without the features that solver can't choose as predicates (see prefilter.py); include
+    # files may have facts about features, and they aren't supported
+    feature_prefilter = None
+    if prefilter and include:
+        logger.warning(colored('Prefilter is not used with include files', 'magenta'))
+    elif prefilter and not pfl.available():
+        logger.warning(colored('Python module clingo not available; prefilter disabled', 'magenta'))
+    elif prefilter:
+        feature_prefilter = pfl.FeaturePrefilter(solver, solve_path / 'prefiltered', parser, distillate_cache, logger)
+
+    # pregrounding of the part of the solver that depends only on the graph files (see pregrounding.py);
+    # include files may define any predicate, and they aren't supported
+    pregrounder = None
+    if preground is not None and include:
+        logger.warning(colored('Pregrounding is not used with include files', 'magenta'))
+        preground = None
+    if preground is not None:
+        if pgr.available():
+            pregrounder = pgr.Pregrounder(solver, [ f'max_action_arity={max_action_arity}', f'num_predicates={max_num_predicates}' ], preground, logger)
+        else:
+            logger.warning(colored('Python module clingo not available; pregrounding disabled', 'magenta'))
+
+    # test set is read once; distillates are kept resident across iterations
+    test_set = TestSet(get_lp_files(test_path), parser, distillate_cache, min_free_memory, logger)
+
+    # subgraphs are rewritten for the relevant nodes in the restored partial.lp
+    if checkpoint is not None and subgraph:
+        relevant = ce.read_partial_file(partial_fname)[0]
+        for inst, distillate in subgraph_distillates.items():
+            fname = data['fnames'][inst]
+            distillate = test_set.distillate(fname) if distillate is None else distillate
+            add_new_instance(inst, fname, solve_path, distillate=distillate, relevant=set([ node for (i, node) in relevant if i == inst ]), logger=logger)
+
+    # setup anytime verification of intermediate models
+    anytime_verifier = None
+    if anytime and not verify_only:
+        intermediate_folder = TemporaryDirectory(prefix='intermediate_models_')
+        anytime_verifier = AnytimeVerifier(Path(intermediate_folder.name), test_set, dict(node_repr=node_repr, appl_engine=appl_engine, grounding=grounding), ignore_constants, logger)
+        solver_cmd_args.update(intermediate_folder=anytime_verifier.folder)
+        solver_cmd_template += ' {intermediate_folder}'
 
     solution_found = False
     while calculate_model:
         iterations += 1
 
         if not verify_only:
-            files = get_lp_files(solve_path, [ f'{solver.name}', f'{best_model_filename.name}', f'{solution_filename.name}' ])
+            files = get_lp_files(solve_path, [ f'{solver.name}', f'{best_model_filename.name}', f'{solution_filename.name}', f'{heuristics_fname.name}' ])
+            warm_started = warm_start and heuristics_fname.exists()
+            if warm_started:
+                files.append(heuristics_fname)
             if include and iterations > 1:
                 for fname in include:
                     if not fname.exists():
                         logger.warning(colored(f"Include file '{fname}' doesn't exist; skipping it", 'red'))
                     else:
                         files.append(fname)
-            files_str = ' '.join([ str(fname) for fname in files ])
+
+            # program and files given to solver: prefiltered graph files, and residual program and static
+            # model when pregrounding
+            solve_solver, solve_files = solver, files
+            if feature_prefilter is not None:
+                solve_files = feature_prefilter.inputs(files, [ partial_fname, heuristics_fname ])
+            if pregrounder is not None:
+                solve_solver, solve_files = pregrounder.inputs(solve_files, [ partial_fname, heuristics_fname ])
+            solver_cmd_args.update(solver=solve_solver)
+            files_str = ' '.join([ str(fname) for fname in solve_files ])
             solver_cmd = solver_cmd_template.format(files=files_str, **solver_cmd_args)
 
             logger.info(f'{colored("**** ITERATION " + str(iterations) + " ****", "red", attrs=["bold"])}')
             logger.info(f'Files={[ str(fname) for fname in files ]}')
-            logger.info(f'Cmd={solver_cmd}')
-
-            solve_output = []
-            time_pair = [ -1, -1 ]
-            if best_model_filename.exists(): best_model_filename.unlink()
-            with Popen(solver_cmd, stdout=PIPE, shell=True, bufsize=1, universal_newlines=True) as p:
-                g_running_children.append(p)
-                for line in p.stdout:
-                    line = line.strip('\n')
-                    logger.info(f'{line}')
-                    solve_output.append(line)
+
+            # record solver inputs of iteration (used by tune_clingo.py)
+            if record_inputs is not None:
+                inputs_path = record_inputs / f'iteration_{iterations:03d}'
+                inputs_path.mkdir(parents=True, exist_ok=True)
+                for fname in [ solver ] + files:
+                    file_copy(fname, inputs_path)
+                logger.info(f'Solver inputs recorded in {inputs_path}')
+
+            # look up solver call in result cache
+            cache_key, cache_entry = None, None
+            if result_cache is not None:
+                cache_key = rc.call_key([ solver ] + files, cache_arguments)
+                cache_entry = rc.lookup(result_cache, cache_key)
+                num_calls, num_cpu_times = len(solver_wall_times), len(solver_cpu_times)
+                readable_offset = readable_models_filename.stat().st_size if readable_models_filename.exists() else 0
+
+            solver_lifted_model = None
+            if cache_entry is not None:
+                if best_model_filename.exists(): best_model_filename.unlink()
+                result = rc.load_result(cache_entry, best_model_filename, readable_models_filename)
+                solver_wall_times.append(result['wall_time'])
+                solver_ground_times.append(result['ground_time'])
+                solver_warm_starts.append(warm_started)
+                if result['cpu_time'] is not None:
+                    solver_cpu_times.append(result['cpu_time'])
+                logger.info(colored(f"Solver (cache): iteration={iterations}, entry={cache_key}, wall_time={result['wall_time']:.3f}, ground_time={result['ground_time']:.3f}, status={result['status']}, optimization={result['optimization']}", 'blue'))
+            elif clingo_engine is not None:
+                if best_model_filename.exists(): best_model_filename.unlink()
+                if anytime_verifier is not None:
+                    anytime_verifier.start(stop=clingo_engine.interrupt)
+                result = clingo_engine.solve(solve_solver, solve_files, max_time, best_model_filename, readable_models_filename, None if anytime_verifier is None else anytime_verifier.folder)
+                solver_lifted_model = result['lifted_model']
+                wall_time = result['ground_time'] + result['solve_time']
+                solver_wall_times.append(wall_time)
+                solver_ground_times.append(result['ground_time'])
+                solver_warm_starts.append(warm_started)
+                logger.info(f"Solver (api): iteration={iterations}, wall_time={wall_time:.3f}, ground_time={result['ground_time']:.3f}, solve_time={result['solve_time']:.3f}, status={result['status']}, cost={result['cost']}")
+                status, optimization = result['status'], list(result['cost'])
+            else:
+                solve_output = []
+                time_pair = [ -1, -1 ]
+                if best_model_filename.exists(): best_model_filename.unlink()
+                if configurations:
+                    # race configurations, each writing its best model in its own files
+                    commands = []
+                    for index, config in enumerate(configurations):
+                        config_args = dict(solver_cmd_args, threads=portfolio_threads, options=config, best_model_filename=Path(portfolio_folder.name) / f'best_model_{index}.lp', readable_models_filename=Path(portfolio_folder.name) / f'readable_models_{index}.txt')
+                        commands.append(solver_cmd_template.format(files=files_str, **config_args))
+                        logger.info(f'Cmd[config {index}]={commands[-1]}')
+                    result = pf.race(commands, g_running_children, logger)
+                    winner = result['winner']
+                    pf.update_stats(portfolio_stats, configurations, result)
+                    pf.save_stats(portfolio_stats_filename, portfolio_stats)
+                    logger.info(f"Portfolio: winner=config {winner} ({configurations[winner]}), optimum={result['optimum']}, times={[ round(t, 3) for t in result['times'] ]}")
+                    winner_model = Path(portfolio_folder.name) / f'best_model_{winner}.lp'
+                    winner_readable = Path(portfolio_folder.name) / f'readable_models_{winner}.txt'
+                    if winner_model.exists():
+                        file_copy(winner_model, best_model_filename)
+                    if winner_readable.exists():
+                        with readable_models_filename.open('a') as fd:
+                            fd.write(winner_readable.read_text())
+                    for fname in Path(portfolio_folder.name).iterdir():
+                        fname.unlink()
+                    solve_output = result['lines']
+                else:
+                    logger.info(f'Cmd={solver_cmd}')
+                    if anytime_verifier is not None:
+                        anytime_verifier.start(stop=lambda: interrupt_process_group(p))
+                    with Popen(solver_cmd, stdout=PIPE, shell=True, bufsize=1, universal_newlines=True, start_new_session=anytime_verifier is not None) as p:
+                        # with start_new_session, the solver pipeline is in its own process group (id is pid of p)
+                        g_running_children.append((p, p.pid if anytime_verifier is not None else None))
+                        for line in p.stdout:
+                            line = line.strip('\n')
+                            logger.info(f'{line}')
+                            solve_output.append(line)
+                    g_running_children.pop()
+                for line in solve_output:
                     if line[:4] == 'Time':
                         time_pair[0] = line.split()
                     elif line[:8] == 'CPU Time':
                         time_pair[1] = line.split()
-            g_running_children.pop()
-
-            # update solver time
-            solver_times_raw.append(tuple(time_pair))
-            if time_pair[0] != -1:
-                assert len(time_pair[0]) == 10 and time_pair[0][2][-1] == 's'
-                wall_time = float(time_pair[0][2][:-1])
-                solve_time = float(time_pair[0][4][:-1])
-                ground_time = wall_time - solve_time
-                solver_wall_times.append(wall_time)
-                solver_ground_times.append(ground_time)
-            if time_pair[1] != -1:
-                assert len(time_pair[1]) == 4 and time_pair[1][3][-1] == 's'
-                cpu_time = float(time_pair[1][3][:-1])
-                solver_cpu_times.append(cpu_time)
+
+                # update solver time
+                solver_times_raw.append(tuple(time_pair))
+                if time_pair[0] != -1:
+                    assert len(time_pair[0]) == 10 and time_pair[0][2][-1] == 's'
+                    wall_time = float(time_pair[0][2][:-1])
+                    solve_time = float(time_pair[0][4][:-1])
+                    ground_time = wall_time - solve_time
+                    solver_wall_times.append(wall_time)
+                    solver_ground_times.append(ground_time)
+                    solver_warm_starts.append(warm_started)
+                    logger.info(f'Solver (subprocess): iteration={iterations}, wall_time={wall_time:.3f}, ground_time={ground_time:.3f}, solve_time={solve_time:.3f}, warm_start={warm_started}')
+                if time_pair[1] != -1:
+                    assert len(time_pair[1]) == 4 and time_pair[1][3][-1] == 's'
+                    cpu_time = float(time_pair[1][3][:-1])
+                    solver_cpu_times.append(cpu_time)
+                status = ' '.join([ line for line in solve_output if line in [ 'SATISFIABLE', 'UNSATISFIABLE', 'OPTIMUM FOUND', 'UNKNOWN' ] ][-1:])
+                optimization = [ [ int(n) for n in line[13:].split() ] for line in solve_output if line[:13] == 'Optimization:' ][-1:]
+                optimization = optimization[0] if optimization else []
+
+            # store result of solver call in result cache
+            if cache_key is not None and cache_entry is None and len(solver_wall_times) > num_calls:
+                readable_text = ''
+                if readable_models_filename.exists():
+                    with readable_models_filename.open('r') as fd:
+                        fd.seek(readable_offset)
+                        readable_text = fd.read()
+                result = dict(status=status,
+                              optimization=optimization,
+                              wall_time=solver_wall_times[-1],
+                              ground_time=solver_ground_times[-1],
+                              cpu_time=solver_cpu_times[-1] if len(solver_cpu_times) > num_cpu_times else None)
+                rc.store_result(result_cache, cache_key, best_model_filename, readable_text, result)
+                rc.evict(result_cache, result_cache_size, logger)
+                logger.info(f'Result cache: stored entry {cache_key}')
+
+            # if an intermediate model was verified, it becomes the best model
+            if anytime_verifier is not None:
+                verified_model = anytime_verifier.finish()
+                logger.info(f'Anytime: {anytime_verifier.stats()}')
+                if verified_model is not None:
+                    logger.info(f'File copy {verified_model} to {best_model_filename}')
+                    file_copy(verified_model, best_model_filename)
+                    solver_lifted_model = None
+
+            # heuristics for next iteration
+            if warm_start and best_model_filename.is_file():
+                write_warm_start_heuristics(heuristics_fname, best_model_filename, logger)
 
         # if this model verifies over test set, no further computation is needed
         calculate_model = False
 
         # If solution found, iterate over test set:
-        #   1. Verify best model over test set, one file at a time
-        #   2. For each failure, expand training set with triplets (s,a,s') for offending nodes
+        #   1. Verify best model over test set, one file at a time in order of size (files may be verified
+        #      concurrently, but results are processed in this order)
+        #   2. For each failure, expand training set with triplets (s,a,s') for offending nodes, until
+        #      max_files_per_iteration failing files or max_nodes_per_iteration nodes are added
         if best_model_filename.is_file():
             logger.info(f'Model found in {best_model_filename}')
-            lifted_model = pg.parse_lifted_model(best_model_filename, logger)
-            if ignore_constants and len(lifted_model['constants']) > 0:
-                logger.info(f"Ignoring constants {lifted_model['constants']} in model")
-                lifted_model['constants'] = set()
+            if not verify_only and solver_lifted_model is not None:
+                # lifted model built by solver engine; best_model_filename is only an output
+                lifted_model = pg.prepare_lifted_model(solver_lifted_model, logger, ignore_constants=ignore_constants)
+            else:
+                lifted_model = pg.read_lifted_model(best_model_filename, logger, ignore_constants=ignore_constants)
+
+            # results of the best model from anytime verification (all files, if it verified over test set)
+            queued = []
+            if anytime_verifier is not None:
+                queued = anytime_verifier.pop_queued(best_model_filename.read_text())
+                logger.info(f'Anytime: {len(queued)} queued result(s) of best model')
 
-            test_files = sort_lp_files_by_size(get_lp_files(test_path))
             solution_found = True
             verify_times = []
+            verify_start_time = timer()
+            batch_files, batch_nodes = 0, 0
+
+            # results of the best model found by anytime verification (queued) are processed first (they are
+            # for a prefix of the test set), and their files aren't verified again
+            def verification_results():
+                yield from queued
+                yield from test_set.verify(lifted_model, jobs=verify_jobs, skip=set([ result['fname'] for result in queued ]), node_repr=node_repr, appl_engine=appl_engine, grounding=grounding)
 
-            for fname in test_files:
-                verify_start_time = timer()
-                distillate = pg.parse_graph_file(fname, logger)
-                ground_model = pg.ground(lifted_model, distillate, logger)
-                inst, unverified_nodes = verify_ground_model(ground_model, logger)
-                verify_elapsed_time = timer() - verify_start_time
-                verify_times.append(verify_elapsed_time)
+            for result in verification_results():
+                fname, inst, unverified_nodes = result['fname'], result['inst'], result['unverified_nodes']
+                verify_times.append(result['verify_time'])
 
                 if inst not in data['sink_nodes']:
-                    sinks = pg.read_sink_nodes(distillate, logger)
+                    sinks = result['sinks']
                     #logger.info(f'Sinks: inst={inst}, all={sinks}')
                     data['sink_nodes'][inst] = sinks
                     assert inst not in data['fnames']
@@ -308,11 +660,15 @@ def solve(solver: Path,
 
                 if unverified_nodes:
                     unsolved_nodes = [ (inst, node) for node in unverified_nodes if (inst, node) not in data['already_added'] ]
-                    if not unsolved_nodes:
+                    if not unsolved_nodes and batch_files > 0:
+                        logger.info(f'No new nodes in {fname.name} for current batch; skipping it')
+                        continue
+                    elif not unsolved_nodes:
                         elapsed_time = timer() - start_time
                         logger.info(f'#calls={len(solver_wall_times)}, solve_wall_time={sum(solver_wall_times):.3f}, solve_ground_time={sum(solver_ground_times):.3f}, verify_time={sum(map(lambda batch: sum(batch), verify_times_batches)):.3f}, elapsed_time={elapsed_time:.3f}')
                         if noise == 0.0:
                             logger.critical(colored(f'Looping on partial.lp with nodes {unverified_nodes} from {fname.name}; already_added={data["already_added"]}', 'red', attrs=['bold']))
+                            test_set.close()
                             return False
                         else:
                             logger.warning(colored(f'Looping on partial.lp with nodes {unverified_nodes} from {fname.name}; already_added={data["already_added"]}', 'magenta', attrs=['bold']))
@@ -324,27 +680,88 @@ def solve(solver: Path,
                     if not verify_only:
                         if not (solve_path / fname.name).exists():
                             if noise > 0.0:
+                                # ground model is recomputed, as it isn't kept by the verification
+                                distillate = test_set.distillate(fname)
+                                ground_model = pg.ground(lifted_model, distillate, logger, node_repr=node_repr, appl_engine=appl_engine, grounding=grounding)
                                 noisy_distillate, num_unknowns_inst = add_noise_to_distillate(distillate, noise, noise_scope, ground_model['gatoms'], logger)
                                 logger.info(f'{num_unknowns_inst} unknown atom(s) in instance {inst}')
                                 num_unknowns.append(num_unknowns_inst)
                             else:
                                 noisy_distillate = None
                                 num_unknowns.append(0)
-                            add_new_instance(inst, fname, solve_path, distillate=noisy_distillate, logger=logger)
+                            if bisimulation_stats is not None:
+                                distillate = test_set.distillate(fname) if noisy_distillate is None else noisy_distillate
+                                noisy_distillate, inst_representatives = pg.reduce_distillate(distillate, bisimulation_stats, logger)
+                                representatives[inst] = inst_representatives[inst]
+                            if subgraph:
+                                subgraph_distillates[inst] = noisy_distillate
+                            else:
+                                add_new_instance(inst, fname, solve_path, distillate=noisy_distillate, logger=logger)
                             added_files.append((inst, fname))
-                        added = add_nodes_to_partial_lp_file(partial_fname, data['fnames'], unsolved_nodes, max_nodes_per_iteration, logger)
+                        max_nodes = max_nodes_per_iteration - batch_nodes if max_nodes_per_iteration > 0 else 0
+                        added = add_nodes_to_partial_lp_file(partial_fname, data['fnames'], unsolved_nodes, max_nodes, logger, representatives=representatives)
+                        if subgraph:
+                            # subgraph is (re)written for all relevant nodes of inst in partial.lp
+                            distillate = subgraph_distillates.get(inst)
+                            distillate = test_set.distillate(fname) if distillate is None else distillate
+                            relevant = set([ node for (i, node) in ce.read_partial_file(partial_fname)[0] if i == inst ])
+                            add_new_instance(inst, fname, solve_path, distillate=distillate, relevant=relevant, logger=logger)
                         data['already_added'].update(added)
+                        # nodes in the blocks of added representatives are solved along with them
+                        data['already_added'].update([ (inst, node) for node in pg.represented_nodes(representatives, inst, set([ node for (i, node) in added ])) ])
                         num_added_nodes.append(len(added))
+                        batch_nodes += len(added)
                         calculate_model = True
                     solution_found = False
-                    break
+                    batch_files += 1
+                    if batch_files == max_files_per_iteration or (max_nodes_per_iteration > 0 and batch_nodes >= max_nodes_per_iteration):
+                        break
             verify_times_batches.append(verify_times)
+            if batch_files > 0:
+                batches.append((batch_files, batch_nodes))
+            logger.info(f'Verification: #verified_files={len(verify_times)}, #failing_files={batch_files}, #added_nodes={batch_nodes}, verify_time={sum(verify_times):.3f}, verify_wall_time={timer() - verify_start_time:.3f}, {test_set.stats()}')
         else:
             solution_found = False
 
+        # checkpoint before next call to solver
+        if calculate_model and not verify_only:
+            checkpoint = dict(iterations=iterations,
+                              num_added_nodes=num_added_nodes,
+                              batches=batches,
+                              num_unknowns=num_unknowns,
+                              added_files=added_files,
+                              solver_times_raw=solver_times_raw,
+                              solver_wall_times=solver_wall_times,
+                              solver_ground_times=solver_ground_times,
+                              solver_cpu_times=solver_cpu_times,
+                              solver_warm_starts=solver_warm_starts,
+                              verify_times_batches=verify_times_batches,
+                              data=data,
+                              subgraph_distillates=subgraph_distillates,
+                              representatives=representatives,
+                              bisimulation_stats=bisimulation_stats,
+                              elapsed_time=timer() - start_time,
+                              random_state=random.getstate(),
+                              symbols=SYMBOLS,
+                              partial=partial_fname.read_text() if partial_fname.exists() else None)
+            write_checkpoint(checkpoint_fname, checkpoint, logger)
+
+    test_set.close()
     elapsed_time = timer() - start_time
     status_string = colored('OK', 'green', attrs=['bold']) if solution_found else colored('Failed', 'red', attrs=['bold'])
     logger.info(f'#iterations={iterations}, added_files={added_files}, #added_nodes={sum(num_added_nodes)} in {num_added_nodes}, #unknowns={sum(num_unknowns)} in {num_unknowns}')
+    logger.info(f'#batches={len(batches)}, (#failing_files, #added_nodes) per batch={batches}')
+    if bisimulation_stats is not None:
+        logger.info(f'Bisimulation: {pg.bisimulation_stats_string(bisimulation_stats)}')
+    if feature_prefilter is not None and feature_prefilter.num_facts:
+        num_facts, num_reduced_facts = feature_prefilter.num_facts[-1]
+        logger.info(f'Prefilter: #removed_features={feature_prefilter.num_removed}, #facts={num_facts}, #reduced_facts={num_reduced_facts} in last call, saved={sum([ n - m for n, m in feature_prefilter.num_facts ])} in all calls')
+    if pregrounder is not None:
+        logger.info(f'Pregrounding: #grounded={pregrounder.num_grounded}, #reused={pregrounder.num_reused}, ground_time={pregrounder.ground_time:.3f}')
+    if warm_start:
+        cold = [ t for t, warm in zip(solver_wall_times, solver_warm_starts) if not warm ]
+        warm = [ t for t, warm in zip(solver_wall_times, solver_warm_starts) if warm ]
+        logger.info(f'Warm start: #cold_calls={len(cold)}, cold_wall_time={sum(cold):.3f}, #warm_calls={len(warm)}, warm_wall_time={sum(warm):.3f}, warm_wall_times={[ round(t, 3) for t in warm ]}')
     logger.info(f'#calls={len(solver_wall_times)}, solve_wall_time={sum(solver_wall_times):.3f}, solve_ground_time={sum(solver_ground_times):.3f}, verify_time={sum(map(lambda batch: sum(batch), verify_times_batches)):.3f}, elapsed_time={elapsed_time:.3f}, status={status_string}')
     return solution_found
 
@@ -364,24 +781,66 @@ def _parse_arguments():
     hyper.add_argument('--max_num_predicates', type=int, default=default_max_num_predicates, help=f'set maximum number selected predicates (default={default_max_num_predicates})')
 
     # options for solver
+    default_bisimulation = False
+    default_max_files_per_iteration = 1
     default_max_nodes_per_iteration = 10
+    default_portfolio = 0
+    default_prefilter = False
+    default_preground = False
     default_sat_prepro = 0
+    default_subgraph = False
+    default_warm_start = False
     solver = parser.add_argument_group('additional options for solver')
+    solver.add_argument('--bisimulation', type=lambda x:bool(strtobool(x)), default=default_bisimulation, help=f'give solver the bisimulation quotients of graphs, where bisimilar nodes are merged (boolean, default={default_bisimulation})')
     solver.add_argument('--ignore_constants', action='store_true', help='ignore constant semantics for objects of type constant')
     solver.add_argument('--include', nargs=1, type=Path, default=[], help=f'include additional .lp file')
+    solver.add_argument('--max_files_per_iteration', type=int, default=default_max_files_per_iteration, help=f'max number of failing test files whose nodes are added per iteration (0=all, default={default_max_files_per_iteration})')
     solver.add_argument('--max_nodes_per_iteration', type=int, default=default_max_nodes_per_iteration, help=f'max number of nodes added per iteration (0=all, default={default_max_nodes_per_iteration}')
+    solver.add_argument('--portfolio', type=int, default=default_portfolio, help=f'race this many Clingo configurations per iteration, with per-domain win statistics in cache path (0=disabled, max={len(pf.PORTFOLIO)}, default={default_portfolio})')
+    solver.add_argument('--prefilter', type=lambda x:bool(strtobool(x)), default=default_prefilter, help=f'give solver graph files without the features that solver.lp excludes from predicates with nelegible/1 (boolean, default={default_prefilter})')
+    solver.add_argument('--preground', type=lambda x:bool(strtobool(x)), default=default_preground, help=f'ground part of solver that depends only on graph files once per set of graph files, and cache it in cache path (boolean, default={default_preground})')
     solver.add_argument('--sat_prepro', type=int, default=default_sat_prepro, choices=[0, 1, 2], help=f'set --sat-prepro flag for Clingo solver (default={default_sat_prepro})')
+    solver.add_argument('--subgraph', type=lambda x:bool(strtobool(x)), default=default_subgraph, help=f'add only neighbourhood of relevant nodes of failing test files to solver (boolean, default={default_subgraph})')
+    solver.add_argument('--warm_start', type=lambda x:bool(strtobool(x)), default=default_warm_start, help=f'guide solver with domain heuristics from best model of previous iteration (boolean, default={default_warm_start})')
 
     # options for driver program
+    default_anytime = False
+    default_appl_engine = 'numpy'
     default_aws_instance = False
+    default_clingo_config = None
+    default_cache_path = '.cache'
     default_debug_level = 0
+    default_distillate_cache = False
+    default_engine = 'subprocess'
+    default_grounding = 'join'
     default_max_time = 57600
+    default_min_free_memory = 1024
+    default_node_repr = 'bitset'
+    default_parser = 'regex'
+    default_record_inputs = None
+    default_result_cache = False
+    default_result_cache_size = 4096
+    default_verify_jobs = 1
     driver = parser.add_argument_group('optional arguments for driver program')
+    driver.add_argument('--anytime', type=lambda x:bool(strtobool(x)), default=default_anytime, help=f'verify intermediate models while solving, and stop solver when one verifies (boolean, default={default_anytime})')
+    driver.add_argument('--appl_engine', type=str, default=default_appl_engine, choices=pg.APPL_ENGINES, help=f'engine to calculate nodes where ground actions are applicable (default={default_appl_engine})')
     driver.add_argument('--aws_instance', type=lambda x:bool(strtobool(x)), default=default_aws_instance, help=f'describe AWS instance (boolean, default={default_aws_instance})')
+    driver.add_argument('--cache_path', type=str, default=default_cache_path, help=f'folder for persistent caches (default={default_cache_path})')
+    driver.add_argument('--clingo_config', type=Path, default=default_clingo_config, help='JSON file with Clingo configuration (threads and options) as produced by tune_clingo.py')
     driver.add_argument('--continue', dest='continue_solve', action='store_true', help='continue an interrupted learning process')
     driver.add_argument('--debug_level', type=int, default=default_debug_level, help=f'set debug level (default={default_debug_level})')
+    driver.add_argument('--distillate_cache', type=lambda x:bool(strtobool(x)), default=default_distillate_cache, help=f'cache parsed graph files in cache path (boolean, default={default_distillate_cache})')
+    driver.add_argument('--engine', type=str, default=default_engine, choices=ce.ENGINES, help=f'engine for Clingo solver: in-process with clingo module (api), which grounds as much as the subprocess engine, or one subprocess per iteration (default={default_engine})')
+    driver.add_argument('--grounding', type=str, default=default_grounding, choices=pg.GROUNDING_MODES, help=f'grounding mode for action schemas (default={default_grounding})')
     driver.add_argument('--max_time', type=int, default=default_max_time, help=f'max-time for Clingo solver (0=no limit, default={default_max_time})')
+    driver.add_argument('--min_free_memory', type=int, default=default_min_free_memory, help=f'spill test distillates to disk when available memory (MB) is below this (default={default_min_free_memory})')
+    driver.add_argument('--node_repr', type=str, default=default_node_repr, choices=pg.NODE_REPRS, help=f'representation of nodes in ground models (default={default_node_repr})')
+    driver.add_argument('--parser', type=str, default=default_parser, choices=pg.GRAPH_PARSERS, help=f'parser for graph files (default={default_parser})')
+    driver.add_argument('--record_inputs', type=Path, default=default_record_inputs, help='folder where solver inputs of each iteration are recorded (used by tune_clingo.py)')
+    driver.add_argument('--result_cache', type=lambda x:bool(strtobool(x)), default=default_result_cache, help=f'reuse results of identical solver calls stored in cache path (boolean, default={default_result_cache})')
+    driver.add_argument('--result_cache_size', type=int, default=default_result_cache_size, help=f'max size (MB) of result cache; least recently used results are evicted (default={default_result_cache_size})')
     driver.add_argument('--results', action='append', help=f"folder to store results (default=graphs's folder)")
+    driver.add_argument('--verify_jobs', type=int, default=default_verify_jobs, help=f'number of processes for verifying test files (0=#cpus, 1=sequential, default={default_verify_jobs})')
     driver.add_argument('--verify_only', action='store_true', help='verify best model found over test set')
 
     # randomization
@@ -409,14 +868,18 @@ if __name__ == '__main__':
     cmdline = ' '.join(argv)
     print(f'Call: {cmdline}')
 
-    # setup proper SIGTERM handler
+    # setup proper SIGTERM handler; running children are pairs (p, pgid) where pgid is the id of the
+    # process group of p if it was started in its own session, and None otherwise
     g_running_children = []
     def sigterm_handler(_signo, _stack_frame):
         logger.warning(colored('Process INTERRUPTED by SIGTERM!', 'red'))
         if g_running_children:
             logger.info(f'Killing {len(g_running_children)} subprocess(es) ...')
-            for p in g_running_children:
-                p.kill()
+            for p, pgid in g_running_children:
+                if pgid is None:
+                    p.kill()
+                else:
+                    pf.kill_process_group(pgid)
         exit(0)
     signal.signal(signal.SIGTERM, sigterm_handler)
 
@@ -475,14 +938,21 @@ if __name__ == '__main__':
     logger.info(f'Create logger: file={log_file}, level={log_level}')
     logger.info(f'Call: {cmdline}')
 
-    # populate solve_path
+    # populate solve_path; training files are reduced to their bisimulation quotients if requested
+    bisimulation_stats = dict(files=0, nodes=(0, 0), edges=(0, 0)) if args.bisimulation else None
     if not args.verify_only and not continue_solve:
         train_path = domain / 'train'
         if train_path.exists():
             for fname in train_path.iterdir():
-                if str(fname).endswith('.lp'):
+                if str(fname).endswith('.lp') and bisimulation_stats is not None:
+                    quotient, _ = pg.reduce_distillate(pg.parse_graph_file(fname, logger, parser=args.parser), bisimulation_stats, logger)
+                    logger.info(f'Write bisimulation quotient of {fname} to {solve_path}')
+                    pg.write_graph_file_from_distillate(solve_path / fname.name, quotient, logger)
+                elif str(fname).endswith('.lp'):
                     logger.info(f'File copy {fname} to {solve_path}')
                     file_copy(fname, solve_path)
+        if bisimulation_stats is not None:
+            logger.info(f'Bisimulation of training files: {pg.bisimulation_stats_string(bisimulation_stats)}')
 
         # copy solver to solve_path
         logger.info(f'File copy {solver} to {solve_path}')
@@ -520,7 +990,29 @@ if __name__ == '__main__':
                           sat_prepro=args.sat_prepro,
                           include=args.include,
                           noise=args.noise,
-                          noise_scope=args.scope)
+                          noise_scope=args.scope,
+                          parser=args.parser,
+                          distillate_cache=Path(args.cache_path) / 'distillates' if args.distillate_cache else None,
+                          min_free_memory=args.min_free_memory,
+                          node_repr=args.node_repr,
+                          appl_engine=args.appl_engine,
+                          grounding=args.grounding,
+                          verify_jobs=args.verify_jobs if args.verify_jobs > 0 else cpu_count(),
+                          max_files_per_iteration=args.max_files_per_iteration,
+                          engine=args.engine,
+                          anytime=args.anytime,
+                          portfolio=args.portfolio,
+                          portfolio_stats_filename=Path(args.cache_path) / 'portfolio' / f'{domain.name}.json',
+                          clingo_config=None if args.clingo_config is None else load_clingo_config(args.clingo_config),
+                          record_inputs=args.record_inputs,
+                          subgraph=args.subgraph,
+                          bisimulation_stats=bisimulation_stats,
+                          continue_solve=not args.verify_only and continue_solve,
+                          warm_start=args.warm_start,
+                          result_cache=Path(args.cache_path) / 'results' if args.result_cache else None,
+                          result_cache_size=args.result_cache_size,
+                          preground=Path(args.cache_path) / 'preground' if args.preground else None,
+                          prefilter=args.prefilter)
         solution_found = solve(**solve_args)
     except KeyboardInterrupt:
         logger.warning(colored('Process INTERRUPTED by keyboard (ctrl-C)!', 'red'))
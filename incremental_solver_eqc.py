@@ -14,6 +14,7 @@ import signal, argparse, re, random
 import logging
 
 import parse_and_ground as pg
+from testset import TestSet
 from verifier import verify_ground_model
 from verifier import verify_ground_model_using_equivalence_classes
 
@@ -72,20 +73,9 @@ def get_lp_files(path: Path, exclude_regexes: List[str] = []) -> List[str]:
         files = [ fname for fname in files if not re.match(regex, fname.name) ]
     return sorted(files)
 
-def size_lp_file(fname: Path) -> int:
-    size = 0
-    with fname.open('r') as fd:
-        for line in fd:
-            if line[:5] == 'node(':
-                size += 1
-    return size
-
-def sort_lp_files_by_size(files: List[Path]) -> List[Path]:
-    files_with_size = [ (size_lp_file(fname), fname) for fname in files ]
-    files_with_size.sort(key=lambda pair: pair[0])
-    return [ fname for _, fname in files_with_size ]
-
-def add_nodes_to_partial_lp_file(partial_fname: Path, fnames: dict, unsolved_nodes: List[Tuple], max_nodes_per_iteration: int, logger):
+# Add unsolved nodes to partial.lp; if representatives of nodes in the bisimulation quotient of the
+# instances are given, their representatives (one per block) are added instead
+def add_nodes_to_partial_lp_file(partial_fname: Path, fnames: dict, unsolved_nodes: List[Tuple], max_nodes_per_iteration: int, logger, representatives: Optional[Dict] = None):
     added_nodes = []
     insts = set([ inst for (inst, node) in unsolved_nodes ])
     with partial_fname.open('a') as fd:
@@ -94,7 +84,7 @@ def add_nodes_to_partial_lp_file(partial_fname: Path, fnames: dict, unsolved_nod
             fname = fnames[inst]
             fd.write(f'filename("{fname.name}").\n')
             fd.write(f'partial({inst},"{fname.name}").\n')
-            nodes = [ node for (i, node) in unsolved_nodes if i == inst ]
+            nodes = pg.representative_nodes(representatives, inst, [ node for (i, node) in unsolved_nodes if i == inst ])
             n = max_nodes_per_iteration if max_nodes_per_iteration > 0 else len(nodes)
             random.shuffle(nodes)
             logger.info(f'add_nodes_to_partial_lp_file: inst={inst}, nodes={nodes}, max_nodes_per_iteration={max_nodes_per_iteration}')
@@ -125,7 +115,14 @@ def solve(solver: Path,
           ignore_constants: bool,
           max_nodes_per_iteration: int,
           sat_prepro: int,
-          include: List[Path]) -> bool:
+          include: List[Path],
+          parser: str,
+          distillate_cache: Optional[Path],
+          min_free_memory: int,
+          node_repr: str,
+          appl_engine: str,
+          grounding: str,
+          bisimulation_stats: Optional[Dict]) -> bool:
     # start clock
     start_time = timer()
 
@@ -156,10 +153,18 @@ def solve(solver: Path,
     # - fnames: dict() that maps inst to filenames
     data = dict(log=[], already_added=set(), sink_nodes=dict(), eq_classes=dict(), fnames=dict())
 
+    # if graphs are reduced (bisimulation_stats isn't None), test files are added as bisimulation
+    # quotients; verification is over the original graphs, and representatives maps each inst to the
+    # map from its nodes to their representatives in the quotient
+    representatives = dict()
+
     # setup solver command
     solver_cmd_args = dict(max_time=max_time, max_action_arity=max_action_arity, max_num_predicates=max_num_predicates, solver=solver, best_model_filename=best_model_filename, readable_models_filename=readable_models_filename, sat_prepro=sat_prepro)
     solver_cmd_template = 'clingo -c max_action_arity={max_action_arity} -c num_predicates={max_num_predicates} --fast-exit -t 6 --sat-prepro={sat_prepro} --time-limit={max_time} --stats=0 {solver} {files} | python3 get_best_model.py {best_model_filename} {readable_models_filename}'
 
+    # test set is read once; distillates are kept resident across iterations
+    test_set = TestSet(get_lp_files(test_path), parser, distillate_cache, min_free_memory, logger)
+
     solution_found = False
     while calculate_model:
         iterations += 1
@@ -216,19 +221,15 @@ def solve(solver: Path,
         #   2. For each failure, expand training set with triplets (s,a,s') for offending nodes
         if best_model_filename.is_file():
             logger.info(f'Model found in {best_model_filename}')
-            lifted_model = pg.parse_lifted_model(best_model_filename, logger)
-            if ignore_constants and len(lifted_model['constants']) > 0:
-                logger.info(f"Ignoring constants {lifted_model['constants']} in model")
-                lifted_model['constants'] = set()
+            lifted_model = pg.read_lifted_model(best_model_filename, logger, ignore_constants=ignore_constants)
 
-            test_files = sort_lp_files_by_size(get_lp_files(test_path))
             solution_found = True
             verify_times = []
 
-            for fname in test_files:
+            for fname in test_set:
                 verify_start_time = timer()
-                distillate = pg.parse_graph_file(fname, logger)
-                ground_model = pg.ground(lifted_model, distillate, logger)
+                distillate = test_set.distillate(fname)
+                ground_model = pg.ground(lifted_model, distillate, logger, node_repr=node_repr, appl_engine=appl_engine, grounding=grounding)
                 inst, unverified_nodes, eqc = verify_ground_model_using_equivalence_classes(ground_model, data['already_added'], logger)
                 verify_elapsed_time = timer() - verify_start_time
                 verify_times.append(verify_elapsed_time)
@@ -258,15 +259,23 @@ def solve(solver: Path,
                     # copy fname to solve path, and fill in partial.lp
                     if not verify_only:
                         if not (solve_path / fname.name).exists():
-                            add_new_instance(inst, fname, solve_path, logger=logger)
+                            if bisimulation_stats is not None:
+                                distillate, inst_representatives = pg.reduce_distillate(distillate, bisimulation_stats, logger)
+                                representatives[inst] = inst_representatives[inst]
+                                add_new_instance(inst, fname, solve_path, distillate=distillate, logger=logger)
+                            else:
+                                add_new_instance(inst, fname, solve_path, logger=logger)
                             added_files.append((inst, fname))
-                        added = add_nodes_to_partial_lp_file(partial_fname, data['fnames'], unsolved_nodes, max_nodes_per_iteration, logger)
+                        added = add_nodes_to_partial_lp_file(partial_fname, data['fnames'], unsolved_nodes, max_nodes_per_iteration, logger, representatives=representatives)
                         data['already_added'].update(added)
+                        # nodes in the blocks of added representatives are solved along with them
+                        data['already_added'].update([ (inst, node) for node in pg.represented_nodes(representatives, inst, set([ node for (i, node) in added ])) ])
                         num_added_nodes.append(len(added))
                         calculate_model = True
                     solution_found = False
                     break
             verify_times_batches.append(verify_times)
+            logger.info(f'Verification: #verified_files={len(verify_times)}, verify_time={sum(verify_times):.3f}, {test_set.stats()}')
         else:
             '''
             # Solver returns UNSAT. This could be done if there are relevant nodes that are sink nodes.
@@ -301,6 +310,8 @@ def solve(solver: Path,
     elapsed_time = timer() - start_time
     status_string = colored('OK', 'green', attrs=['bold']) if solution_found else colored('Failed', 'red', attrs=['bold'])
     logger.info(f'#iterations={iterations}, added_files={added_files}, #added_nodes={sum(num_added_nodes)} in {num_added_nodes}, #unknowns={sum(num_unknowns)} in {num_unknowns}')
+    if bisimulation_stats is not None:
+        logger.info(f'Bisimulation: {pg.bisimulation_stats_string(bisimulation_stats)}')
     logger.info(f'#calls={len(solver_wall_times)}, solve_wall_time={sum(solver_wall_times):.3f}, solve_ground_time={sum(solver_ground_times):.3f}, verify_time={sum(map(lambda batch: sum(batch), verify_times_batches)):.3f}, elapsed_time={elapsed_time:.3f}, status={status_string}')
     return solution_found
 
@@ -320,23 +331,39 @@ def _parse_arguments():
     hyper.add_argument('--max_num_predicates', type=int, default=default_max_num_predicates, help=f'set maximum number selected predicates (default={default_max_num_predicates})')
 
     # options for solver
+    default_bisimulation = False
     default_max_nodes_per_iteration = 5
     default_sat_prepro = 0
     solver = parser.add_argument_group('additional options for solver')
+    solver.add_argument('--bisimulation', type=lambda x:bool(strtobool(x)), default=default_bisimulation, help=f'give solver the bisimulation quotients of graphs, where bisimilar nodes are merged (boolean, default={default_bisimulation})')
     solver.add_argument('--ignore_constants', action='store_true', help='ignore constant semantics for objects of type constant')
     solver.add_argument('--include', nargs=1, type=Path, default=[], help=f'include additional .lp file')
     solver.add_argument('--max_nodes_per_iteration', type=int, default=default_max_nodes_per_iteration, help=f'max number of nodes added per iteration (0=all, default={default_max_nodes_per_iteration})')
     solver.add_argument('--sat_prepro', type=int, default=default_sat_prepro, choices=[0, 1, 2], help=f'set --sat-prepro flag for Clingo solver (default={default_sat_prepro})')
 
     # options for driver program
+    default_appl_engine = 'numpy'
     default_aws_instance = False
+    default_cache_path = '.cache'
     default_debug_level = 0
+    default_distillate_cache = False
+    default_grounding = 'join'
     default_max_time = 57600
+    default_min_free_memory = 1024
+    default_node_repr = 'bitset'
+    default_parser = 'regex'
     driver = parser.add_argument_group('optional arguments for driver program')
+    driver.add_argument('--appl_engine', type=str, default=default_appl_engine, choices=pg.APPL_ENGINES, help=f'engine to calculate nodes where ground actions are applicable (default={default_appl_engine})')
     driver.add_argument('--aws_instance', type=lambda x:bool(strtobool(x)), default=default_aws_instance, help=f'describe AWS instance (boolean, default={default_aws_instance})')
+    driver.add_argument('--cache_path', type=str, default=default_cache_path, help=f'folder for persistent caches (default={default_cache_path})')
     driver.add_argument('--continue', dest='continue_solve', action='store_true', help='continue an interrupted learning process')
     driver.add_argument('--debug_level', type=int, default=default_debug_level, help=f'set debug level (default={default_debug_level})')
+    driver.add_argument('--distillate_cache', type=lambda x:bool(strtobool(x)), default=default_distillate_cache, help=f'cache parsed graph files in cache path (boolean, default={default_distillate_cache})')
+    driver.add_argument('--grounding', type=str, default=default_grounding, choices=pg.GROUNDING_MODES, help=f'grounding mode for action schemas (default={default_grounding})')
     driver.add_argument('--max_time', type=int, default=default_max_time, help=f'max-time for Clingo solver (0=no limit, default={default_max_time})')
+    driver.add_argument('--min_free_memory', type=int, default=default_min_free_memory, help=f'spill test distillates to disk when available memory (MB) is below this (default={default_min_free_memory})')
+    driver.add_argument('--node_repr', type=str, default=default_node_repr, choices=pg.NODE_REPRS, help=f'representation of nodes in ground models (default={default_node_repr})')
+    driver.add_argument('--parser', type=str, default=default_parser, choices=pg.GRAPH_PARSERS, help=f'parser for graph files (default={default_parser})')
     driver.add_argument('--results', action='append', help=f"folder to store results (default=graphs's folder)")
     driver.add_argument('--verify_only', action='store_true', help='verify best model found over test set')
 
@@ -421,14 +448,21 @@ if __name__ == '__main__':
     logger.info(f'Create logger: file={log_file}, level={log_level}')
     logger.info(f'Call: {cmdline}')
 
-    # populate solve_path
+    # populate solve_path; training files are reduced to their bisimulation quotients if requested
+    bisimulation_stats = dict(files=0, nodes=(0, 0), edges=(0, 0)) if args.bisimulation else None
     if not args.verify_only and not continue_solve:
         train_path = domain / 'train'
         if train_path.exists():
             for fname in train_path.iterdir():
-                if str(fname).endswith('.lp'):
+                if str(fname).endswith('.lp') and bisimulation_stats is not None:
+                    quotient, _ = pg.reduce_distillate(pg.parse_graph_file(fname, logger, parser=args.parser), bisimulation_stats, logger)
+                    logger.info(f'Write bisimulation quotient of {fname} to {solve_path}')
+                    pg.write_graph_file_from_distillate(solve_path / fname.name, quotient, logger)
+                elif str(fname).endswith('.lp'):
                     logger.info(f'File copy {fname} to {solve_path}')
                     file_copy(fname, solve_path)
+        if bisimulation_stats is not None:
+            logger.info(f'Bisimulation of training files: {pg.bisimulation_stats_string(bisimulation_stats)}')
 
         # copy solver to solve_path
         logger.info(f'File copy {solver} to {solve_path}')
@@ -464,7 +498,14 @@ if __name__ == '__main__':
                           ignore_constants=args.ignore_constants,
                           max_nodes_per_iteration=args.max_nodes_per_iteration,
                           sat_prepro=args.sat_prepro,
-                          include=args.include)
+                          include=args.include,
+                          parser=args.parser,
+                          distillate_cache=Path(args.cache_path) / 'distillates' if args.distillate_cache else None,
+                          min_free_memory=args.min_free_memory,
+                          node_repr=args.node_repr,
+                          appl_engine=args.appl_engine,
+                          grounding=args.grounding,
+                          bisimulation_stats=bisimulation_stats)
         solution_found = solve(**solve_args)
     except KeyboardInterrupt:
         logger.warning(colored('Process INTERRUPTED by keyboard (ctrl-C)!', 'red'))
@@ -1,11 +1,16 @@
 from tqdm import tqdm
 from sys import stdout
 from pathlib import Path
-from itertools import product
-from typing import List, Dict
+from itertools import product, chain
+from typing import List, Dict, Optional, Tuple
+from collections import Counter
 from termcolor import colored
 from progress.spinner import Spinner
 from timeit import default_timer as timer
+import numpy as np
+import re
+
+from symbols import SYMBOLS
 
 def read_file(filename: Path, logger) -> List[str]:
     lines = [ line for line in filename.open('r') ]
@@ -56,54 +61,67 @@ def parse_record(record: str, sep_tok: str = ',', grouping_tok: str = '()', logg
     if debug: logger.debug(f'Record={record}, fields={fields}')
     return fields
 
-# Read lifted model from .lp file, specified with facts a_arity/2, pred/1, eff/3, prec/3, and constant/1
-def parse_lifted_model(filename: Path, logger) -> dict:
+# Build lifted model from records, one per fact of the model: ('a_arity', action, arity), ('pred', pred),
+# ('eff', action, (pred, args), value), ('prec', action, (pred, args), value), and ('constant', constant),
+# where args is a tuple of ints (action parameters) and strings (constants), or ('null',) for nullary atoms
+def lifted_model_from_records(records, logger) -> dict:
     lifted_model = dict(action=dict(), pred=set(), eff=[], prec=[], constants=set())
-    for line in read_file(filename, logger):
-        if line[:8] == 'a_arity(' and line[-1] == '.':
-            fields = parse_record(line[8:-2], logger=logger, debug=False)
-            action = fields[0]
-            arity = int(fields[1])
+    for record in records:
+        if record[0] == 'a_arity':
+            action, arity = record[1], record[2]
             if action not in lifted_model['action']:
                 lifted_model['action'][action] = dict(arity=arity, prec=[], eff=[])
             else:
                 lifted_model['action'][action]['arity'] = arity
-        elif line[:5] == 'pred(' and line[-1] == '.':
-            fields = parse_record(line[5:-2], logger=logger, debug=False)
-            lifted_model['pred'].add(fields[0])
-        elif line[:4] == 'eff(' and line[-1] == '.':
-            fields = parse_record(line[4:-2], logger=logger, debug=False)
-            assert len(fields) == 3
-            action = fields[0]
+        elif record[0] == 'pred':
+            lifted_model['pred'].add(record[1])
+        elif record[0] == 'eff' or record[0] == 'prec':
+            action, (pred, args), value = record[1], record[2], record[3]
             if action not in lifted_model['action']:
                 lifted_model['action'][action] = dict(arity=-1, prec=[], eff=[])
-            atom_fields = parse_record(fields[1][1:-1], logger=logger, debug=False)
-            atom_args = parse_record(atom_fields[1][1:-1], logger=logger, debug=False)
-            if atom_args == [ 'null' ]:
-                atom = (atom_fields[0], (0,))
-            else:
-                atom = (atom_fields[0], tuple([ int(arg) if arg.isdecimal() else arg for arg in atom_args ]))
-            value = int(fields[2])
-            lifted_model['action'][action]['eff'].append((atom, value))
-        elif line[:5] == 'prec(' and line[-1] == '.':
+            atom = (pred, (0,)) if args == ('null',) else (pred, args)
+            lifted_model['action'][action][record[0]].append((atom, value))
+        elif record[0] == 'constant':
+            lifted_model['constants'].add(record[1])
+        else:
+            logger.warning(f'Unrecognized record |{record}|')
+    return lifted_model
+
+# Read lifted model from .lp file, specified with facts a_arity/2, pred/1, eff/3, prec/3, and constant/1
+def parse_lifted_model(filename: Path, logger) -> dict:
+    return lifted_model_from_records(read_lifted_model_records(filename, logger), logger)
+
+# Prepare lifted model for verification: with ignore_constants, constants are treated as regular objects
+def prepare_lifted_model(lifted_model: dict, logger, ignore_constants: bool = False) -> dict:
+    if ignore_constants and len(lifted_model['constants']) > 0:
+        logger.info(f"Ignoring constants {lifted_model['constants']} in model")
+        lifted_model['constants'] = set()
+    return lifted_model
+
+# Read lifted model from .lp file and prepare it for verification
+def read_lifted_model(filename: Path, logger, ignore_constants: bool = False) -> dict:
+    return prepare_lifted_model(parse_lifted_model(filename, logger), logger, ignore_constants=ignore_constants)
+
+def read_lifted_model_records(filename: Path, logger):
+    for line in read_file(filename, logger):
+        if line[:8] == 'a_arity(' and line[-1] == '.':
+            fields = parse_record(line[8:-2], logger=logger, debug=False)
+            yield ('a_arity', fields[0], int(fields[1]))
+        elif line[:5] == 'pred(' and line[-1] == '.':
             fields = parse_record(line[5:-2], logger=logger, debug=False)
+            yield ('pred', fields[0])
+        elif (line[:4] == 'eff(' or line[:5] == 'prec(') and line[-1] == '.':
+            kind = line[:line.index('(')]
+            fields = parse_record(line[len(kind)+1:-2], logger=logger, debug=False)
             assert len(fields) == 3
-            action = fields[0]
-            if action not in lifted_model['action']:
-                lifted_model['action'][action] = dict(arity=-1, prec=[], eff=[])
             atom_fields = parse_record(fields[1][1:-1], logger=logger, debug=False)
             atom_args = parse_record(atom_fields[1][1:-1], logger=logger, debug=False)
-            if atom_args == [ 'null' ]:
-                atom = (atom_fields[0], (0,))
-            else:
-                atom = (atom_fields[0], tuple([ int(arg) if arg.isdecimal() else arg for arg in atom_args ]))
-            value = int(fields[2])
-            lifted_model['action'][action]['prec'].append((atom, value))
+            args = tuple([ int(arg) if arg.isdecimal() else arg for arg in atom_args ])
+            yield (kind, fields[0], (atom_fields[0], args), int(fields[2]))
         elif line[:9] == 'constant(' and line[-1] == '.':
             fields = parse_record(line[9:-2], logger=logger, debug=False)
             assert len(fields) == 1
-            constant = fields[0]
-            lifted_model['constants'].add(constant)
+            yield ('constant', fields[0])
         elif line[:8] == 'tlabelR(' and line[-1] == '.':
             fields = parse_record(line[8:-2], logger=logger, debug=False)
             assert len(fields) == 3
@@ -114,112 +132,253 @@ def parse_lifted_model(filename: Path, logger) -> dict:
             assert False
         else:
             logger.warning(f'Unrecognized line |{line}|')
-    return lifted_model
+
+# Graph-file parsers: 'regex' tokenizes the whole file buffer at once and matches the common facts
+# with compiled regexes, while 'legacy' is the original line-by-line parser built on parse_record.
+# Both parsers produce the same distillate; facts not matched by a regex fall back to parse_record.
+GRAPH_PARSERS = [ 'regex', 'legacy' ]
+
+# Version of the distillate produced by the parsers; it must be increased whenever the structure of
+# the distillate changes as it is part of the key for cached distillates (see distillate_cache.py)
+PARSER_VERSION = 2
+
+# Representations of nodes in ground models: 'set' stores the true atoms of each node as a set of atom
+# indices, while 'bitset' additionally stores them as an integer whose bit i is set iff atom i is true,
+# so that applicability and transitions become mask operations (see ground and transition)
+NODE_REPRS = [ 'bitset', 'set' ]
+
+# Engines to calculate the nodes where ground actions are applicable: 'numpy' does it for batches of
+# actions with reductions over a boolean nodes x atoms matrix (see applicable_nodes_numpy), while
+# 'python' checks each pair of action and node
+APPL_ENGINES = [ 'numpy', 'python' ]
+
+# Grounding modes for action schemas: 'product' checks every tuple of distinct objects, while 'join'
+# only considers the bindings obtained by joining the positive preconditions of the schema against the
+# ground atoms (see join_bindings). Both modes produce the same ground actions in the same order.
+GROUNDING_MODES = [ 'join', 'product' ]
+
+_comment_re = re.compile(r'%[^\n]*')
+_inner_comment_re = re.compile(r'\s%')
+_fval_re = re.compile(r'fval\((\d+),\(([^,()]+),\(([^()]*)\)\),(?:(\d+),)?(\d+)\)\.')
+_tlabel_re = re.compile(r'tlabel\((\d+),\((\d+),(\d+)\),([^,()]+)\)\.')
+_node_re = re.compile(r'node\((\d+),(\d+)\)\.')
+_f_static_re = re.compile(r'f_static\((\d+),([^,()]+)\)\.')
+_f_arity_re = re.compile(r'f_arity\(([^,()]+),(\d+)\)\.')
+_f_complexity_re = re.compile(r'f_complexity\(([^,()]+),(\d+)\)\.')
+_instance_re = re.compile(r'instance\((\d+)\)\.')
+_feature_re = re.compile(r'feature\(([^,()]+)\)\.')
+_constant_re = re.compile(r'constant\(([^,()]+)\)\.')
+
+def _strip_comment(m: re.Match) -> str:
+    # as in read_file, '%' starts a comment only at the beginning of a record
+    start, text = m.start(), m.group(0)
+    if start == 0 or m.string[start-1].isspace():
+        return ''
+    inner = _inner_comment_re.search(text)
+    return text if inner is None else text[:inner.start()+1]
+
+def _split_args(args: str) -> tuple:
+    # same as parse_record on a flat list of arguments: only a trailing empty field is dropped
+    fields = args.split(',')
+    if fields[-1] == '': fields.pop()
+    return tuple(fields)
+
+# In distillates, static features (f_static), constants, and the atoms in valuations (fval_static,
+# fval) are interned in the shared symbol table SYMBOLS; labels, and feature names in feature and
+# complexity, are kept as strings
+def _new_distillate(filename: Path) -> Dict:
+    return dict(graph_filename=filename,
+                node=dict(),
+                tlabel=dict(),
+                constant=dict(),
+                f_static=dict(),
+                fval=dict(),
+                fval_static=dict(),
+                feature=dict(),
+                complexity=dict())
+
+def _add_tlabel(distillate: Dict, inst: int, label: str, edge: tuple) -> None:
+    if inst not in distillate['tlabel']:
+        distillate['tlabel'][inst] = dict()
+    if label not in distillate['tlabel'][inst]:
+        distillate['tlabel'][inst][label] = set()
+    distillate['tlabel'][inst][label].add(edge)
+
+def _add_node(distillate: Dict, inst: int, node: int) -> None:
+    if inst not in distillate['node']:
+        distillate['node'][inst] = []
+    distillate['node'][inst].append(node)
+
+def _add_f_static(distillate: Dict, inst: int, feature: int) -> None:
+    if inst not in distillate['f_static']:
+        distillate['f_static'][inst] = set()
+    distillate['f_static'][inst].add(feature)
+
+def _add_fval(distillate: Dict, inst: int, atom: int, node: Optional[int], value: int) -> None:
+    key = 'fval_static' if node == None else 'fval'
+    if inst not in distillate[key]:
+        distillate[key][inst] = dict()
+        distillate[key][inst][0] = set()
+        distillate[key][inst][1] = set()
+        if node != None:
+            distillate[key][inst]['node'] = dict()
+
+    fval = (atom, node) if node != None else atom
+    distillate[key][inst][value].add(fval)
+
+    if node != None:
+        if node not in distillate[key][inst]['node']:
+            distillate[key][inst]['node'][node] = []
+        distillate[key][inst]['node'][node].append((atom, value))
+
+def _add_f_arity(distillate: Dict, feature: str, arity: int, line: str) -> None:
+    if feature not in distillate['feature']:
+        distillate['feature'][feature] = arity
+    else:
+        assert distillate['feature'][feature] == arity, f"Arity mismatch for '{feature}': registered={distillate['feature'][feature]}, got={arity}, line=|{line}|"
+
+def _add_f_complexity(distillate: Dict, feature: str, complexity: int, line: str) -> None:
+    if feature not in distillate['complexity']:
+        distillate['complexity'][feature] = complexity
+    else:
+        assert distillate['complexity'][feature] == complexity, f"Complexity mismatch for '{feature}': registered={distillate['complexity'][feature]}, got={complexity}, line=|{line}|"
+
+def _add_constant(distillate: Dict, inst: int, constant: int) -> None:
+    if inst not in distillate['constant']:
+        distillate['constant'][inst] = set()
+    distillate['constant'][inst].add(constant)
+
+# Parse single record (fact) of graph file with parse_record, and add it to distillate. Returns the
+# current instance index which is needed by facts that don't mention the instance (e.g. constant/1)
+def _parse_graph_record(distillate: Dict, line: str, inst: Optional[int], logger) -> Optional[int]:
+    if line[:9] == 'instance(' and line[-1] == '.':
+        fields = parse_record(line[9:-2], logger=logger, debug=False)
+        inst = int(fields[0])
+    elif line[:7] == 'tlabel(' and line[-1] == '.':
+        fields = parse_record(line[7:-2], logger=logger, debug=False)
+        inst = int(fields[0])
+        label = fields[2]
+        edge_fields = parse_record(fields[1][1:-1], logger=logger, debug=False)
+        assert len(edge_fields) == 2
+        edge = (int(edge_fields[0]), int(edge_fields[1]))
+        _add_tlabel(distillate, inst, label, edge)
+    elif line[:5] == 'node(' and line[-1] == '.':
+        fields = parse_record(line[5:-2], logger=logger, debug=False)
+        inst = int(fields[0])
+        node = int(fields[1])
+        _add_node(distillate, inst, node)
+    elif line[:9] == 'f_static(' and line[-1] == '.':
+        fields = parse_record(line[9:-2], logger=logger, debug=False)
+        inst = int(fields[0])
+        feature = SYMBOLS.symbol(fields[1])
+        _add_f_static(distillate, inst, feature)
+    elif line[:5] == 'fval(' and line[-1] == '.':
+        fields = parse_record(line[5:-2], logger=logger, debug=False)
+        assert len(fields) in [3, 4]
+        inst = int(fields[0])
+        atom_fields = parse_record(fields[1][1:-1], logger=logger, debug=False)
+        assert len(atom_fields) == 2
+        arg_fields = parse_record(atom_fields[1][1:-1], logger=logger, debug=False)
+        atom = SYMBOLS.atom_from_names(atom_fields[0], tuple(arg_fields))
+        node = None if len(fields) == 3 else int(fields[2])
+        value = int(fields[-1])
+        _add_fval(distillate, inst, atom, node, value)
+    elif line[:8] == 'feature(' and line[-1] == '.':
+        fields = parse_record(line[8:-2], logger=logger, debug=False)
+        assert len(fields) == 1
+    elif line[:8] == 'f_arity(' and line[-1] == '.':
+        fields = parse_record(line[8:-2], logger=logger, debug=False)
+        assert len(fields) == 2
+        _add_f_arity(distillate, fields[0], int(fields[1]), line)
+    elif line[:13] == 'f_complexity(' and line[-1] == '.':
+        fields = parse_record(line[13:-2], logger=logger, debug=False)
+        assert len(fields) == 2
+        _add_f_complexity(distillate, fields[0], int(fields[1]), line)
+    elif line[:9] == 'constant(' and line[-1] == '.':
+        fields = parse_record(line[9:-2], logger=logger, debug=False)
+        assert len(fields) == 1
+        _add_constant(distillate, inst, SYMBOLS.symbol(fields[0]))
+    else:
+        logger.warning(f'Unrecognized line |{line}|')
+    return inst
 
 # Parse graph from .lp file, specified with facts instance/1, tlabel/3, node/2, f_static/2, fval/3-4, feature/1, and f_arity/2
-def parse_graph_file(filename: Path, logger) -> Dict:
+def parse_graph_file(filename: Path, logger, parser: str = 'regex') -> Dict:
+    assert filename.name[-3:] == '.lp', f"{colored('ERROR:', 'red')} unexpected filename '{filename}'"
+    assert parser in GRAPH_PARSERS, f"{colored('ERROR:', 'red')} unexpected parser '{parser}'"
+    if parser == 'legacy':
+        return parse_graph_file_legacy(filename, logger)
+
+    distillate = _new_distillate(filename)
+    with filename.open('r') as fd:
+        records = _comment_re.sub(_strip_comment, fd.read()).split()
+
+    inst = None
+    atoms = dict() # interned atoms of fval facts, indexed by their (pred, args) strings
+    for record in records:
+        m = _fval_re.fullmatch(record)
+        if m:
+            inst_str, pred, args, node_str, value_str = m.groups()
+            inst = int(inst_str)
+            atom = atoms.get((pred, args))
+            if atom is None:
+                atom = atoms[(pred, args)] = SYMBOLS.atom_from_names(pred, _split_args(args))
+            _add_fval(distillate, inst, atom, None if node_str is None else int(node_str), int(value_str))
+            continue
+
+        head = record[:record.find('(')]
+        if head == 'tlabel':
+            m = _tlabel_re.fullmatch(record)
+            if m:
+                inst = int(m.group(1))
+                _add_tlabel(distillate, inst, m.group(4), (int(m.group(2)), int(m.group(3))))
+                continue
+        elif head == 'node':
+            m = _node_re.fullmatch(record)
+            if m:
+                inst = int(m.group(1))
+                _add_node(distillate, inst, int(m.group(2)))
+                continue
+        elif head == 'f_static':
+            m = _f_static_re.fullmatch(record)
+            if m:
+                inst = int(m.group(1))
+                _add_f_static(distillate, inst, SYMBOLS.symbol(m.group(2)))
+                continue
+        elif head == 'f_arity':
+            m = _f_arity_re.fullmatch(record)
+            if m:
+                _add_f_arity(distillate, m.group(1), int(m.group(2)), record)
+                continue
+        elif head == 'f_complexity':
+            m = _f_complexity_re.fullmatch(record)
+            if m:
+                _add_f_complexity(distillate, m.group(1), int(m.group(2)), record)
+                continue
+        elif head == 'instance':
+            m = _instance_re.fullmatch(record)
+            if m:
+                inst = int(m.group(1))
+                continue
+        elif head == 'feature':
+            if _feature_re.fullmatch(record):
+                continue
+        elif head == 'constant':
+            m = _constant_re.fullmatch(record)
+            if m:
+                _add_constant(distillate, inst, SYMBOLS.symbol(m.group(1)))
+                continue
+        inst = _parse_graph_record(distillate, record, inst, logger)
+    logger.info(f'{len(records)} record(s) from {filename}')
+    return distillate
+
+# Original parser for graph files, kept as fallback (and reference) for the regex-based parser
+def parse_graph_file_legacy(filename: Path, logger) -> Dict:
     assert filename.name[-3:] == '.lp', f"{colored('ERROR:', 'red')} unexpected filename '{filename}'"
-    distillate = dict(graph_filename=filename,
-                      node=dict(),
-                      tlabel=dict(),
-                      constant=dict(),
-                      f_static=dict(),
-                      fval=dict(),
-                      fval_static=dict(),
-                      feature=dict(),
-                      complexity=dict())
+    distillate = _new_distillate(filename)
+    inst = None
     for line in read_file(filename, logger):
-        if line[:9] == 'instance(' and line[-1] == '.':
-            fields = parse_record(line[9:-2], logger=logger, debug=False)
-            inst = int(fields[0])
-        elif line[:7] == 'tlabel(' and line[-1] == '.':
-            fields = parse_record(line[7:-2], logger=logger, debug=False)
-            inst = int(fields[0])
-            label = fields[2]
-            edge_fields = parse_record(fields[1][1:-1], logger=logger, debug=False)
-            assert len(edge_fields) == 2
-            edge = (int(edge_fields[0]), int(edge_fields[1]))
-            if inst not in distillate['tlabel']:
-                distillate['tlabel'][inst] = dict()
-            if label not in distillate['tlabel'][inst]:
-                distillate['tlabel'][inst][label] = set()
-            distillate['tlabel'][inst][label].add(edge)
-        elif line[:5] == 'node(' and line[-1] == '.':
-            fields = parse_record(line[5:-2], logger=logger, debug=False)
-            inst = int(fields[0])
-            node = int(fields[1])
-            if inst not in distillate['node']:
-                distillate['node'][inst] = []
-            distillate['node'][inst].append(node)
-        elif line[:9] == 'f_static(' and line[-1] == '.':
-            fields = parse_record(line[9:-2], logger=logger, debug=False)
-            inst = int(fields[0])
-            feature = fields[1]
-            if inst not in distillate['f_static']:
-                distillate['f_static'][inst] = set()
-            distillate['f_static'][inst].add(feature)
-        elif line[:5] == 'fval(' and line[-1] == '.':
-            fields = parse_record(line[5:-2], logger=logger, debug=False)
-            assert len(fields) in [3, 4]
-            inst = int(fields[0])
-            atom_fields = parse_record(fields[1][1:-1], logger=logger, debug=False)
-            assert len(atom_fields) == 2
-            arg_fields = parse_record(atom_fields[1][1:-1], logger=logger, debug=False)
-            atom = (atom_fields[0], tuple(arg_fields))
-            node = None if len(fields) == 3 else int(fields[2])
-            value = int(fields[-1])
-
-            key = 'fval_static' if len(fields) == 3 else 'fval'
-            if inst not in distillate[key]:
-                distillate[key][inst] = dict()
-                distillate[key][inst][0] = set()
-                distillate[key][inst][1] = set()
-                #distillate[key][inst]['atom'] = dict()
-                if node != None:
-                    distillate[key][inst]['node'] = dict()
-
-            #if atom[0] not in distillate[key][inst]['atom']:
-            #    distillate[key][inst]['atom'][atom[0]] = []
-
-            fval = (atom, node) if node != None else atom
-            distillate[key][inst][value].add(fval)
-            #fval = (atom[1], node, value) if node != None else (atom[1], value)
-            #distillate[key][inst]['atom'][atom[0]].append(fval)
-
-            if node != None:
-                if node not in distillate[key][inst]['node']:
-                    distillate[key][inst]['node'][node] = []
-                distillate[key][inst]['node'][node].append((atom, value))
-        elif line[:8] == 'feature(' and line[-1] == '.':
-            fields = parse_record(line[8:-2], logger=logger, debug=False)
-            assert len(fields) == 1
-            feature = fields[0]
-        elif line[:8] == 'f_arity(' and line[-1] == '.':
-            fields = parse_record(line[8:-2], logger=logger, debug=False)
-            assert len(fields) == 2
-            feature = fields[0]
-            arity = int(fields[1])
-            if feature not in distillate['feature']:
-                distillate['feature'][feature] = arity
-            else:
-                assert distillate['feature'][feature] == arity, f"Arity mismatch for '{feature}': registered={distillate['feature'][feature]}, got={arity}, line=|{line}|"
-        elif line[:13] == 'f_complexity(' and line[-1] == '.':
-            fields = parse_record(line[13:-2], logger=logger, debug=False)
-            assert len(fields) == 2
-            feature = fields[0]
-            complexity = int(fields[1])
-            if feature not in distillate['complexity']:
-                distillate['complexity'][feature] = complexity
-            else:
-                assert distillate['complexity'][feature] == complexity, f"Complexity mismatch for '{feature}': registered={distillate['complexity'][feature]}, got={complexity}, line=|{line}|"
-        elif line[:9] == 'constant(' and line[-1] == '.':
-            fields = parse_record(line[9:-2], logger=logger, debug=False)
-            assert len(fields) == 1
-            if inst not in distillate['constant']:
-                distillate['constant'][inst] = set()
-            distillate['constant'][inst].add(fields[0])
-        else:
-            logger.warning(f'Unrecognized line |{line}|')
+        inst = _parse_graph_record(distillate, line, inst, logger)
     return distillate
 
 def write_graph_file_from_distillate(filename: Path, distillate: Dict, logger) -> None:
@@ -247,7 +406,7 @@ def write_graph_file_from_distillate(filename: Path, distillate: Dict, logger) -
             fd.write('% Constants\n')
             if inst in distillate['constant']:
                 for const in distillate['constant'][inst]:
-                    fd.write(f'constant({const}).\n')
+                    fd.write(f'constant({SYMBOLS.name(const)}).\n')
 
             # features (arities, complexities and static)
             fd.write('% Features (predicates)\n')
@@ -261,13 +420,14 @@ def write_graph_file_from_distillate(filename: Path, distillate: Dict, logger) -
                 fd.write(f'f_complexity({feature},{complexity}).\n')
             if inst in distillate['f_static']:
                 for feature in distillate['f_static'][inst]:
-                    fd.write(f'f_static({inst},{feature}).\n')
+                    fd.write(f'f_static({inst},{SYMBOLS.name(feature)}).\n')
 
             # valuations for static predicates
             fd.write('% Valuations for static predicates\n')
             if inst in distillate['fval_static']:
                 for value in [0, 1]:
-                    for (pred, args) in distillate['fval_static'][inst][value]:
+                    for atom in distillate['fval_static'][inst][value]:
+                        pred, args = SYMBOLS.atom_r_names(atom)
                         joined = ','.join(args)
                         if len(args) == 1: joined += ','
                         fd.write(f'fval({inst},({pred},({joined})),{value}).\n')
@@ -276,7 +436,8 @@ def write_graph_file_from_distillate(filename: Path, distillate: Dict, logger) -
             fd.write('% Valuations for dynamic predicates\n')
             if inst in distillate['fval']:
                 for node in distillate['fval'][inst]['node']:
-                    for ((pred, args), value) in distillate['fval'][inst]['node'][node]:
+                    for (atom, value) in distillate['fval'][inst]['node'][node]:
+                        pred, args = SYMBOLS.atom_r_names(atom)
                         joined = ','.join(args)
                         if len(args) == 1: joined += ','
                         fd.write(f'fval({inst},({pred},({joined})),{node},{value}).\n')
@@ -285,11 +446,265 @@ def write_graph_file_from_distillate(filename: Path, distillate: Dict, logger) -
             if 'unknown' in distillate and inst in distillate['unknown']:
                 fd.write('% Unknowns\n')
                 for node in distillate['unknown'][inst]['node']:
-                    for (pred, args) in distillate['unknown'][inst]['node'][node]:
+                    for atom in distillate['unknown'][inst]['node'][node]:
+                        pred, args = SYMBOLS.atom_r_names(atom)
                         joined = ','.join(args)
                         if len(args) == 1: joined += ','
                         fd.write(f'unknown({inst},({pred},({joined})),{node}).\n')
 
+# Neighbourhood subgraph of distillate to be given to the solver, where relevant maps each instance
+# to its relevant nodes (as in partial.lp). The subgraph contains the relevant nodes and their
+# successors, the transitions leaving relevant nodes, the valuations (and unknowns) of these nodes,
+# and all the static facts (constants, features, and static valuations that define the objects).
+#
+# The solver defines nullary/1 and nelegible/1 over the valuations of all nodes. For each feature
+# that loses its witness for one of them, one valuation of a dropped node is kept in static form;
+# static valuations of non-static features are only read by these rules in solver.lp.
+def neighbourhood_subgraph(distillate: Dict, relevant: Dict[int, set]) -> Dict:
+    null, verum = SYMBOLS.symbol('null'), SYMBOLS.symbol('verum')
+    subgraph = dict(distillate, node=dict(), tlabel=dict(), fval=dict(), fval_static=dict())
+    if 'unknown' in distillate:
+        subgraph['unknown'] = dict()
+
+    for inst in distillate['node']:
+        rnodes = relevant.get(inst, set())
+        nodes = set(rnodes)
+        subgraph['tlabel'][inst] = dict()
+        for label, edges in distillate['tlabel'].get(inst, dict()).items():
+            subgraph['tlabel'][inst][label] = set([ (src, dst) for (src, dst) in edges if src in rnodes ])
+            nodes.update([ dst for (src, dst) in subgraph['tlabel'][inst][label] ])
+        subgraph['node'][inst] = [ node for node in distillate['node'][inst] if node in nodes ]
+
+        fval_static = distillate['fval_static'].get(inst, { 0: set(), 1: set() })
+        subgraph['fval_static'][inst] = { 0: set(fval_static[0]), 1: set(fval_static[1]) }
+        if inst in distillate['fval']:
+            fval = distillate['fval'][inst]
+            subgraph['fval'][inst] = { 0: set(), 1: set(), 'node': dict() }
+            for node in fval['node']:
+                if node in nodes:
+                    subgraph['fval'][inst]['node'][node] = fval['node'][node]
+                    for (atom, value) in fval['node'][node]:
+                        subgraph['fval'][inst][value].add((atom, node))
+
+            # witnesses for nullary/1 and nelegible/1
+            objects = set([ SYMBOLS.atoms_r[atom][1][0] for atom in fval_static[1] if SYMBOLS.atoms_r[atom][0] == verum ])
+            def witness(atom: int) -> Optional[tuple]:
+                pred, args = SYMBOLS.atoms_r[atom]
+                if args == (null,):
+                    return ('nullary', pred)
+                elif len(args) <= 2 and any([ arg not in objects for arg in args ]):
+                    return ('nelegible', pred)
+                return None
+            witnessed = set([ witness(atom) for value in [0, 1] for atom in fval_static[value] ])
+            for node in subgraph['fval'][inst]['node']:
+                witnessed.update([ witness(atom) for (atom, value) in fval['node'][node] ])
+            for node in fval['node']:
+                if node not in nodes:
+                    for (atom, value) in fval['node'][node]:
+                        key = witness(atom)
+                        if key is not None and key not in witnessed:
+                            witnessed.add(key)
+                            subgraph['fval_static'][inst][value].add(atom)
+
+        if 'unknown' in distillate and inst in distillate['unknown']:
+            unknown = distillate['unknown'][inst]['node']
+            subgraph['unknown'][inst] = dict(node={ node: unknown[node] for node in unknown if node in nodes })
+    return subgraph
+
+# Representatives of the nodes of each instance in the coarsest bisimulation of the distillate: two
+# nodes are bisimilar iff they have the same valuation (and unknowns) and, for each label, the same
+# number of transitions into each block. The partition by valuations is refined by the multisets of
+# labelled successors until it is stable. As the solver counts the transitions of each node (e.g. each
+# transition is mapped to a different ground action), nodes that are targets of transitions with the
+# same label from the same node are never merged, so that the quotient keeps these transitions. Returns
+# dict that maps each instance to a dict that maps nodes to the least node in their block.
+def bisimulation_representatives(distillate: Dict) -> Dict[int, Dict[int, int]]:
+    def blocks(nodes: List[int], keys: Dict[int, tuple]) -> Dict[int, int]:
+        reprs = dict()
+        for node in sorted(nodes):
+            reprs.setdefault(keys[node], node)
+        return { node: reprs[keys[node]] for node in nodes }
+
+    representatives = dict()
+    for inst, nodes in distillate['node'].items():
+        fval = distillate['fval'][inst]['node'] if inst in distillate['fval'] else dict()
+        unknown = distillate['unknown'][inst]['node'] if 'unknown' in distillate and inst in distillate['unknown'] else dict()
+        successors = { node: [] for node in nodes }
+        for label, edges in distillate['tlabel'].get(inst, dict()).items():
+            for (src, dst) in edges:
+                successors[src].append((label, dst))
+
+        # targets of parallel transitions with same label are kept in singleton blocks
+        targets = Counter([ (src, label) for src in nodes for (label, dst) in successors[src] ])
+        singletons = set([ dst for src in nodes for (label, dst) in successors[src] if targets[(src, label)] > 1 ])
+
+        block = blocks(nodes, { node: (frozenset(fval.get(node, [])), frozenset(unknown.get(node, [])), node if node in singletons else None) for node in nodes })
+        num_blocks = len(set(block.values()))
+        while True:
+            block = blocks(nodes, { node: (block[node], frozenset(Counter([ (label, block[dst]) for (label, dst) in successors[node] ]).items())) for node in nodes })
+            if len(set(block.values())) == num_blocks:
+                break
+            num_blocks = len(set(block.values()))
+        representatives[inst] = block
+    return representatives
+
+# Quotient of distillate for given representatives (see bisimulation_representatives): it contains the
+# representatives, the transitions between their blocks, and the valuations (and unknowns) of the
+# representatives. Static facts are kept, and the set of valuations of each instance is preserved.
+def bisimulation_quotient(distillate: Dict, representatives: Dict[int, Dict[int, int]]) -> Dict:
+    quotient = dict(distillate, node=dict(), tlabel=dict(), fval=dict())
+    if 'unknown' in distillate:
+        quotient['unknown'] = dict()
+
+    for inst in distillate['node']:
+        rep = representatives[inst]
+        quotient['node'][inst] = [ node for node in distillate['node'][inst] if rep[node] == node ]
+        quotient['tlabel'][inst] = dict()
+        for label, edges in distillate['tlabel'].get(inst, dict()).items():
+            quotient['tlabel'][inst][label] = set([ (rep[src], rep[dst]) for (src, dst) in edges ])
+
+        if inst in distillate['fval']:
+            fval = distillate['fval'][inst]
+            quotient['fval'][inst] = { 0: set(), 1: set(), 'node': dict() }
+            for node in fval['node']:
+                if rep[node] == node:
+                    quotient['fval'][inst]['node'][node] = fval['node'][node]
+                    for (atom, value) in fval['node'][node]:
+                        quotient['fval'][inst][value].add((atom, node))
+
+        if 'unknown' in distillate and inst in distillate['unknown']:
+            unknown = distillate['unknown'][inst]['node']
+            quotient['unknown'][inst] = dict(node={ node: unknown[node] for node in unknown if rep[node] == node })
+    return quotient
+
+# Number of nodes and number of edges of distillate
+def distillate_size(distillate: Dict) -> tuple:
+    num_nodes = sum([ len(nodes) for nodes in distillate['node'].values() ])
+    num_edges = sum([ len(edges) for tlabel in distillate['tlabel'].values() for edges in tlabel.values() ])
+    return num_nodes, num_edges
+
+# Replace distillate by its bisimulation quotient, and add its reduction to stats (fields files, nodes
+# and edges, where nodes and edges are pairs for original graphs and quotients). Returns the quotient,
+# and the map from nodes to their representatives in the quotient for each instance
+def reduce_distillate(distillate: Dict, stats: Dict, logger) -> Tuple[Dict, Dict]:
+    representatives = bisimulation_representatives(distillate)
+    quotient = bisimulation_quotient(distillate, representatives)
+    num_nodes, num_edges = distillate_size(distillate)
+    num_quotient_nodes, num_quotient_edges = distillate_size(quotient)
+    stats['files'] += 1
+    stats['nodes'] = (stats['nodes'][0] + num_nodes, stats['nodes'][1] + num_quotient_nodes)
+    stats['edges'] = (stats['edges'][0] + num_edges, stats['edges'][1] + num_quotient_edges)
+    logger.info(f"Bisimulation quotient of '{distillate['graph_filename']}': #nodes={num_quotient_nodes}/{num_nodes}, #edges={num_quotient_edges}/{num_edges}")
+    return quotient, representatives
+
+def bisimulation_stats_string(stats: Dict) -> str:
+    ratio = lambda pair: pair[1] / pair[0] if pair[0] > 0 else 1.0
+    return f"#files={stats['files']}, #nodes={stats['nodes'][1]}/{stats['nodes'][0]} ({ratio(stats['nodes']):.3f}), #edges={stats['edges'][1]}/{stats['edges'][0]} ({ratio(stats['edges']):.3f})"
+
+# Representatives of nodes of instance (one per block), if representatives of the instance are given
+def representative_nodes(representatives: Optional[Dict], inst: int, nodes: List[int]) -> List[int]:
+    if representatives is not None and inst in representatives:
+        return sorted(set([ representatives[inst][node] for node in nodes ]))
+    return nodes
+
+# Nodes of instance in the blocks of given representatives (the representatives themselves, if
+# representatives of the instance aren't given)
+def represented_nodes(representatives: Optional[Dict], inst: int, reprs: set) -> List[int]:
+    if representatives is not None and inst in representatives:
+        return [ node for node, rep in representatives[inst].items() if rep in reprs ]
+    return list(reprs)
+
+# Features that can be removed from the distillates of the graph files given to the solver without
+# changing its models: those that the solver can't choose as predicates because of nelegible/1 in
+# solver.lp. A feature is nelegible if one of its unary or binary atoms has an argument that isn't an
+# object of the instance (for unary atoms, other than null). The atoms are those in the valuations, and
+# the ones filled in as false by the solver (if fill_incomplete_valuations) for the tuples of objects
+# and constants (of all the distillates) of the arity of the feature, which is zero for nullary features.
+# Feature verum, which defines the objects, and features with atoms that have both values (rejected by
+# a constraint in solver.lp) are never removed.
+def prefilter_features(distillates: List[Dict], fill_incomplete_valuations: bool, equal_objects: bool) -> set:
+    null, verum = SYMBOLS.symbol('null'), SYMBOLS.symbol('verum')
+    arity = dict()
+    for distillate in distillates:
+        arity.update({ SYMBOLS.symbol(feature): n for feature, n in distillate['feature'].items() })
+    constants = set([ const for distillate in distillates for consts in distillate['constant'].values() for const in consts ])
+
+    nelegible, nullary, conflicting, instances = set(), set(), set(), []
+    for distillate in distillates:
+        for inst in set(distillate['node']) | set(distillate['fval']) | set(distillate['fval_static']):
+            nodes = set(distillate['node'].get(inst, []))
+            fval_static = distillate['fval_static'].get(inst, { 0: set(), 1: set() })
+            fval = distillate['fval'].get(inst, { 0: set(), 1: set() })
+            objects = set([ SYMBOLS.atoms_r[atom][1][0] for atom in fval_static[1] if SYMBOLS.atoms_r[atom][0] == verum and len(SYMBOLS.atoms_r[atom][1]) == 1 ])
+
+            # atoms in valuations
+            for atom in fval_static[0] | fval_static[1] | set([ atom for value in [0, 1] for (atom, node) in fval[value] ]):
+                pred, args = SYMBOLS.atoms_r[atom]
+                if len(args) == 1 and args[0] != null and args[0] not in objects:
+                    nelegible.add(pred)
+                elif len(args) == 2 and (args[0] not in objects or args[1] not in objects):
+                    nelegible.add(pred)
+            nullary.update([ SYMBOLS.atoms_r[atom][0] for atom in fval_static[0] | fval_static[1] if SYMBOLS.atoms_r[atom][1] == (null,) ])
+            nullary.update([ SYMBOLS.atoms_r[atom][0] for value in [0, 1] for (atom, node) in fval[value] if node in nodes and SYMBOLS.atoms_r[atom][1] == (null,) ])
+            conflicting.update([ SYMBOLS.atoms_r[atom][0] for atom in fval_static[0] & fval_static[1] ])
+            conflicting.update([ SYMBOLS.atoms_r[atom][0] for (atom, node) in fval[0] & fval[1] ])
+            if inst in distillate['node']:
+                instances.append((objects, len(nodes) > 0, distillate['f_static'].get(inst, set())))
+
+    # atoms filled in as false whose tuples contain a constant that isn't an object
+    if fill_incomplete_valuations:
+        for objects, has_nodes, f_static in instances:
+            others = constants - objects
+            for pred, n in arity.items():
+                if n == 1 and pred not in nullary and others - set([ null ]):
+                    witness = True
+                elif n == 2 and others and (equal_objects or len(objects | constants) > 1):
+                    witness = True
+                else:
+                    witness = False
+                if witness and (pred in f_static or has_nodes):
+                    nelegible.add(pred)
+
+    removable = set([ pred for pred in nelegible if pred in arity ]) - conflicting - set([ verum ])
+    return set(SYMBOLS.names(removable))
+
+# Distillate without the facts about features (feature and complexity, static features, valuations,
+# and unknowns)
+def remove_features(distillate: Dict, features: set) -> Dict:
+    symbols = set([ SYMBOLS.symbol(feature) for feature in features ])
+    keep = lambda atom: SYMBOLS.atoms_r[atom][0] not in symbols
+    reduced = dict(distillate, feature=dict(), complexity=dict(), f_static=dict(), fval=dict(), fval_static=dict())
+    reduced['feature'] = { feature: n for feature, n in distillate['feature'].items() if feature not in features }
+    reduced['complexity'] = { feature: n for feature, n in distillate['complexity'].items() if feature not in features }
+    for inst in distillate['f_static']:
+        reduced['f_static'][inst] = distillate['f_static'][inst] - symbols
+    for inst in distillate['fval_static']:
+        reduced['fval_static'][inst] = { value: set(filter(keep, distillate['fval_static'][inst][value])) for value in [0, 1] }
+    for inst in distillate['fval']:
+        fval = distillate['fval'][inst]
+        reduced['fval'][inst] = { value: set([ (atom, node) for (atom, node) in fval[value] if keep(atom) ]) for value in [0, 1] }
+        reduced['fval'][inst]['node'] = { node: [ (atom, value) for (atom, value) in fval['node'][node] if keep(atom) ] for node in fval['node'] }
+    if 'unknown' in distillate:
+        reduced['unknown'] = { inst: dict(node={ node: list(filter(keep, atoms)) for node, atoms in unknown['node'].items() }) for inst, unknown in distillate['unknown'].items() }
+    return reduced
+
+# Number of facts written by write_graph_file_from_distillate for distillate
+def graph_fact_count(distillate: Dict) -> int:
+    count = 0
+    for inst in distillate['node']:
+        count += 1 + len(distillate['node'][inst])
+        count += sum([ len(edges) for edges in distillate['tlabel'].get(inst, dict()).values() ])
+        count += len(distillate['constant'].get(inst, []))
+        count += 2 * len(distillate['feature']) + len(distillate['complexity'])
+        count += len(distillate['f_static'].get(inst, []))
+        if inst in distillate['fval_static']:
+            count += len(distillate['fval_static'][inst][0]) + len(distillate['fval_static'][inst][1])
+        if inst in distillate['fval']:
+            count += sum([ len(values) for values in distillate['fval'][inst]['node'].values() ])
+        if 'unknown' in distillate and inst in distillate['unknown']:
+            count += sum([ len(atoms) for atoms in distillate['unknown'][inst]['node'].values() ])
+    return count
+
 def read_sink_nodes(distillate: Dict, logger) -> set:
     inst = list(distillate['node'].keys())[0]
     nodes = distillate['node'][inst]
@@ -307,11 +722,13 @@ def read_sink_nodes(distillate: Dict, logger) -> set:
 # contained in the distillate. Returns dictionary with two type of elements: elements that are
 # shared by all instances, and elements that are particular to each instance.
 #
+# Predicates, objects and ground atoms are the integers given by the shared symbol table SYMBOLS.
+#
 # The first type of elements are given as part of the input (i.e., not computed by this function),
 # yet they are copied from input to output:
 #   - name of the graph file ['graph_filename']
-#   - set of predicates used to define the lifted model ['pred']
-#   - set of constants used in the lifted model ['constants']
+#   - set of predicates used to define the lifted model ['pred'] (interned)
+#   - set of constants used in the lifted model ['constants'] (interned)
 #   - dictionary that maps feature names to their arities ['feature'] (taken as is from input)
 #   - set of static features ['f_static'] (takes as is from input)
 #   - set of instances used to index elements of second type ['instances']
@@ -320,25 +737,33 @@ def read_sink_nodes(distillate: Dict, logger) -> set:
 # information provided in a graph file):
 #   - dictionary ['that maps action labels into set of edges, where edge is pair (src_index,dst_index)
 #       (read off from .lp graph file; provided as is from input; these are the edges in input graph) ['tlabel']
-#   - dictionary that maps grounded atoms to indices, where grounded atom is pair (name, obj-tuple) ['gatoms']
+#   - dictionary that maps grounded atoms to indices, where grounded atom is atom in SYMBOLS ['gatoms']
 #   - list that maps atom indices to grounded atoms; reverse of map provided by gatoms ['gatoms_r']
 #   - NEED DESC ['fval_static']
-#   - NEED DESC ['fval']
+#   - NEED DESC ['fval']; if node_repr is 'bitset', ['fval'][inst]['bits'] maps nodes to bitsets
 #   - set of objects ['objects']
 #   - dictionary that maps grounded action names to indices, where grounded action name is pair (label,
 #       obj-tuple) ['gactions']
 #   - list that maps ground action indices to dictionary that contains label, args, prec, eff, and appl,
 #       where label is action label, args is obj-tuple, prec and eff are lists of triplets (gatom, index,
-#       value), and appl is boolean ['gactions_r']
+#       value) with gatom the pair (pred, obj-tuple), and appl is boolean ['gactions_r']; if node_repr is
+#       'bitset', prec_bits is pair of masks for positive and negative dynamic preconditions
+#   - representation of nodes ['node_repr']
+#   - index in CSR form that maps nodes to indices of ground actions applicable at them ['appl_index']
+#   - index in CSR form that maps nodes to their outgoing edges in input graph ['out_edges']
 
 # CHECK: Grounded actions are obtained by instantiations that do not repeat objects in arguments
 # CHECK: This shouldn't be fixed here, rather it should be a choice determined by an option (pruning
 #        is done with filter_fn function)
 
-def ground(lifted_model: Dict, distillate: Dict, logger, debug: bool = False) -> dict:
+def ground(lifted_model: Dict, distillate: Dict, logger, debug: bool = False, node_repr: str = 'bitset', appl_engine: str = 'numpy', grounding: str = 'join') -> dict:
+    assert node_repr in NODE_REPRS, f"{colored('ERROR:', 'red')} unexpected node representation '{node_repr}'"
+    assert appl_engine in APPL_ENGINES, f"{colored('ERROR:', 'red')} unexpected applicability engine '{appl_engine}'"
+    assert grounding in GROUNDING_MODES, f"{colored('ERROR:', 'red')} unexpected grounding mode '{grounding}'"
     ground_model = dict(graph_filename=distillate['graph_filename'],
-                        pred=lifted_model['pred'],
-                        constants=lifted_model['constants'],
+                        node_repr=node_repr,
+                        pred=set([ SYMBOLS.symbol(pred) for pred in lifted_model['pred'] ]),
+                        constants=set([ SYMBOLS.symbol(constant) for constant in lifted_model['constants'] ]),
                         feature=distillate['feature'],
                         f_static=distillate['f_static'],
                         tlabel=distillate['tlabel'])
@@ -346,6 +771,19 @@ def ground(lifted_model: Dict, distillate: Dict, logger, debug: bool = False) ->
     start_time = timer()
     spinner = Spinner('Grounding lifted model... ')
 
+    # nullary atoms are normalized to atoms with empty args
+    nullary_args = set([ (SYMBOLS.symbol('null'),), (SYMBOLS.symbol('0'),) ])
+    normalized = dict()
+    def normalize(atom: int) -> int:
+        if atom not in normalized:
+            pred, args = SYMBOLS.atoms_r[atom]
+            if args in nullary_args:
+                ground_model['feature'][SYMBOLS.name(pred)] = 0
+                normalized[atom] = SYMBOLS.atom(pred, ())
+            else:
+                normalized[atom] = atom
+        return normalized[atom]
+
     # instance indices and ground atoms from fval_static and fval elements in distillate
     ground_model.update(dict(instances=set(), gatoms=dict(), gatoms_r=dict()))
     for key in [ 'fval_static', 'fval' ]:
@@ -356,11 +794,7 @@ def ground(lifted_model: Dict, distillate: Dict, logger, debug: bool = False) ->
                 ground_model['gatoms_r'][inst] = []
             for value in range(2):
                 for item in distillate[key][inst][value]:
-                    atom = item[0] if type(item[0]) == tuple else item
-                    assert type(atom) == tuple and len(atom) == 2
-                    if atom[1] == ('null',) or atom[1] == ('0',):
-                        atom = (atom[0], ())
-                        ground_model['feature'][atom[0]] = 0
+                    atom = normalize(item[0] if type(item) == tuple else item)
                     if atom not in ground_model['gatoms'][inst]:
                         index = len(ground_model['gatoms'][inst])
                         ground_model['gatoms'][inst][atom] = index
@@ -376,96 +810,150 @@ def ground(lifted_model: Dict, distillate: Dict, logger, debug: bool = False) ->
     ground_model.update(dict(fval_static=dict(), fval=dict()))
     for key in [ 'fval_static', 'fval' ]:
         for inst in distillate[key].keys():
+            gatoms = ground_model['gatoms'][inst]
             ground_model[key][inst] = dict()
             ground_model[key][inst][1] = []
             for item in distillate[key][inst][1]:
-                atom = item[0] if type(item[0]) == tuple else item
-                node = item[1] if type(item[0]) == tuple else None
-                if atom[1] == ('null',) or atom[1] == ('0',): atom = (atom[0], ())
-                assert atom in ground_model['gatoms'][inst], f'grounding: (1) inst={inst}, atom={atom}'
-                gatom = ground_model['gatoms'][inst][atom]
+                atom = normalize(item[0] if type(item) == tuple else item)
+                node = item[1] if type(item) == tuple else None
+                assert atom in gatoms, f'grounding: (1) inst={inst}, atom={SYMBOLS.atom_r_names(atom)}'
+                gatom = gatoms[atom]
                 ground_model[key][inst][1].append(gatom if node == None else (gatom, node))
                 spinner.next()
 
     for inst in distillate['fval'].keys():
+        gatoms = ground_model['gatoms'][inst]
         ground_model['fval'][inst]['node'] = dict()
         for node in distillate['fval'][inst]['node'].keys():
             ground_model['fval'][inst]['node'][node] = set()
             for atom, value in distillate['fval'][inst]['node'][node]:
                 if value == 1:
-                    if atom[1] == ('null',) or atom[1] == ('0',): atom = (atom[0], ())
-                    assert atom in ground_model['gatoms'][inst], f'grounding: (2) inst={inst}, atom={atom}'
-                    gatom = ground_model['gatoms'][inst][atom]
-                    ground_model['fval'][inst]['node'][node].add(gatom)
-            #assert set([ atom for atom, st in ground_model['fval'][inst][1] if st == node ]) == ground_model['fval'][inst]['node'][node]
+                    atom = normalize(atom)
+                    assert atom in gatoms, f'grounding: (2) inst={inst}, atom={SYMBOLS.atom_r_names(atom)}'
+                    ground_model['fval'][inst]['node'][node].add(gatoms[atom])
             spinner.next()
+        if node_repr == 'bitset':
+            ground_model['fval'][inst]['bits'] = { node: gatoms_mask(node_gatoms) for node, node_gatoms in ground_model['fval'][inst]['node'].items() }
 
     # objects
     num_objects = dict()
+    verum = SYMBOLS.symbol('verum')
     ground_model.update(dict(objects=dict()))
     for inst in ground_model['gatoms_r']:
         ground_model['objects'][inst] = set()
         for atom in ground_model['gatoms_r'][inst]:
-            assert type(atom[0]) == str and type(atom[1]) == tuple
-            if atom[0] == 'verum':
-                for obj in atom[1]: ground_model['objects'][inst].add(obj)
+            pred, args = SYMBOLS.atoms_r[atom]
+            if pred == verum:
+                for obj in args: ground_model['objects'][inst].add(obj)
             spinner.next()
         num_objects[inst] = len(ground_model['objects'][inst])
 
+    # lifted preconditions and effects over symbols: each argument is pair (param, obj) where param
+    # is the index of the action argument, or None if the argument is the object (constant) obj
+    schemas = dict()
+    for label in lifted_model['action']:
+        schemas[label] = dict(prec=[], eff=[])
+        for key in ['prec', 'eff']:
+            for lifted, value in lifted_model['action'][label][key]:
+                assert lifted[0] in lifted_model['pred']
+                if lifted[1] == (0,):
+                    largs = ()
+                else:
+                    assert 0 not in lifted[1]
+                    largs = tuple([ (i-1, None) if type(i) == int else (None, SYMBOLS.symbol(i)) for i in lifted[1] ])
+                schemas[label][key].append((SYMBOLS.symbol(lifted[0]), largs, value))
+
     # grounded actions
     ground_model.update(dict(gactions=dict(), gactions_r=dict()))
     for inst in ground_model['instances']:
+        gatoms = ground_model['gatoms'][inst]
         ground_model['gactions'][inst] = dict()
         ground_model['gactions_r'][inst] = []
+        candidates = [] # pairs (gaction, warnings) for ground actions whose static preconditions hold
+        objects = [ item for item in ground_model['objects'][inst] if item not in ground_model['constants'] ]
+        if grounding == 'join':
+            atoms_by_pred = dict()
+            for atom in gatoms:
+                pred, args = SYMBOLS.atoms_r[atom]
+                if pred not in atoms_by_pred: atoms_by_pred[pred] = []
+                atoms_by_pred[pred].append(args)
+
         for label in lifted_model['action']:
+            schema_start_time = timer()
             arity = lifted_model['action'][label]['arity']
             assert arity >= 0, f'{colored("ERROR:", "red")} grounding: arity={arity} for action {label}'
             filter_fn = lambda item: len(set(item)) == arity # CHECK: THIS FILTER RESULTS IN GROUNDED ACTIONS WITHOUT REPEATED ARGUMENTS
             # CHECK: THIS DECISON IS NOT FIXED. PROPER THING WOULD BE TO ADD FLAG TO SOLVER AND USE IT IN THIS FUNCTION AND TO SET opt_equal_objects IN ASP PROGRAM
-            for args in filter(filter_fn, product([ item for item in ground_model['objects'][inst] if item not in ground_model['constants'] ], repeat=arity)):
+            if grounding == 'join':
+                positive_precs = [ (pred, largs) for pred, largs, value in schemas[label]['prec'] if value == 1 ]
+                bindings = join_bindings(positive_precs, arity, atoms_by_pred, ground_model['f_static'].get(inst, set()), objects)
+            else:
+                bindings = filter(filter_fn, product(objects, repeat=arity))
+
+            num_bindings, num_candidates = 0, len(candidates)
+            for args in bindings:
                 # calculate ground action and nodes where it's applicable
+                num_bindings += 1
                 gaction = dict(label=label, args=args, prec=[], eff=[], appl=[])
                 is_applicable = True
                 warnings = []
                 for key in ['prec', 'eff']:
-                    for lifted, value in lifted_model['action'][label][key]:
-                        #if key == 'eff' and lifted[0] in distillate['f_static'][inst]:
-                        #    print(f"{colored('WARNING:', 'magenta')} effect '{lifted[0]}({','.join([ str(i) for i in lifted[1] ])})={value}' over static predicate '{lifted[0]}' for inst={inst}")
-                        assert lifted[0] in lifted_model['pred']
-                        if lifted[1] == (0,):
-                            pargs = ()
-                        else:
-                            assert 0 not in lifted[1]
-                            pargs = tuple([ args[i-1] if type(i) == int else i for i in lifted[1] ])
-                        glifted = (lifted[0], pargs)
-                        index = -1 if glifted not in ground_model['gatoms'][inst] else ground_model['gatoms'][inst][glifted]
+                    for pred, largs, value in schemas[label][key]:
+                        pargs = tuple([ args[i] if i is not None else obj for i, obj in largs ])
+                        glifted = (pred, pargs)
+                        index = gatoms.get(SYMBOLS.find_atom(pred, pargs), -1)
                         if index == -1:
                             if key == 'prec' and value == 1:
                                 is_applicable = False
                                 break
                             elif debug:
-                                warnings.append(f'{colored("INFO:", "green")} grounding: inexistent ground atom {glifted} (value={value}) in {key} for inst={inst} in {label}({",".join(args)})')
+                                warnings.append(f'{colored("INFO:", "green")} grounding: inexistent ground atom {SYMBOLS.atom_names(pred, pargs)} (value={value}) in {key} for inst={inst} in {label}({",".join(SYMBOLS.names(args))})')
                         gaction[key].append((glifted, index, value))
                     spinner.next()
                     if not is_applicable: break
 
                 if is_applicable and applicable_static(ground_model, inst, gaction):
-                    for node in ground_model['fval'][inst]['node']:
-                        if applicable_dynamic(ground_model, inst, node, gaction):
-                            gaction['appl'].append(node)
+                    if node_repr == 'bitset':
+                        gaction['prec_bits'] = dynamic_prec_masks(ground_model, inst, gaction)
+                    candidates.append((gaction, warnings))
 
-                    if gaction['appl']:
-                        index = len(ground_model['gactions_r'][inst])
-                        ground_model['gactions'][inst][(label, args)] = index
-                        ground_model['gactions_r'][inst].append(gaction)
-                        if debug: logger.debug(f'gaction: {index}={(label, args)}, appl={gaction["appl"]}')
-                        for warning in warnings: logger.warning(f'{warning}')
+            num_tuples = len(objects) ** arity
+            logger.info(f'Grounding ({grounding}): inst={inst}, schema={label}/{arity}, #tuples={num_tuples}, #bindings={num_bindings}, #pruned={num_tuples - num_bindings}, #candidates={len(candidates) - num_candidates}, elapsed_time={timer() - schema_start_time:.3f}')
+
+        # nodes where ground actions are applicable
+        if appl_engine == 'numpy':
+            applicable_nodes_numpy(ground_model, inst, [ gaction for gaction, _ in candidates ])
+        elif node_repr == 'bitset':
+            for gaction, _ in candidates:
+                pos, neg = gaction['prec_bits']
+                gaction['appl'] = [ node for node, bits in ground_model['fval'][inst]['bits'].items() if bits & pos == pos and not bits & neg ]
+        else:
+            for gaction, _ in candidates:
+                for node in ground_model['fval'][inst]['node']:
+                    if applicable_dynamic(ground_model, inst, node, gaction):
+                        gaction['appl'].append(node)
+
+        for gaction, warnings in candidates:
+            if gaction['appl']:
+                label, args = gaction['label'], gaction['args']
+                index = len(ground_model['gactions_r'][inst])
+                ground_model['gactions'][inst][(label, args)] = index
+                ground_model['gactions_r'][inst].append(gaction)
+                if debug: logger.debug(f'gaction: {index}={(label, tuple(SYMBOLS.names(args)))}, appl={gaction["appl"]}')
+                for warning in warnings: logger.warning(f'{warning}')
 
     # calculate number nodes
     num_nodes = dict()
     for inst in distillate['node']:
         num_nodes[inst] = len(distillate['node'][inst])
 
+    # node-indexed inverted indexes for applicable actions and outgoing edges
+    ground_model.update(dict(appl_index=dict(), out_edges=dict()))
+    for inst in ground_model['instances']:
+        num_rows = 1 + max(list(ground_model['fval'][inst]['node'].keys()) + [ src for edges in ground_model['tlabel'].get(inst, dict()).values() for src, _ in edges ], default=-1)
+        ground_model['appl_index'][inst] = appl_index(ground_model['gactions_r'][inst], num_rows)
+        ground_model['out_edges'][inst] = edge_index(ground_model['tlabel'].get(inst, dict()), num_rows)
+
     # finish spinner
     spinner.writeln('Grounding lifted model... done!')
     spinner.finish()
@@ -499,41 +987,248 @@ def applicable_dynamic(ground_model: Dict, inst: int, node_index: int, gaction:
                 return False
     return True
 
+# Bitset for given ground atom indices
+def gatoms_mask(gatoms) -> int:
+    mask = 0
+    for index in gatoms:
+        mask |= 1 << index
+    return mask
+
+# Masks (pos, neg) for dynamic preconditions of given ground action: the action is applicable in node
+# with bitset bits iff bits & pos == pos and bits & neg == 0 (static preconditions aren't considered)
+def dynamic_prec_masks(ground_model: Dict, inst: int, gaction: Dict) -> tuple:
+    pos, neg = 0, 0
+    for gprec, index, value in gaction['prec']:
+        assert gprec[0] in ground_model['pred']
+        if gprec[0] not in ground_model['f_static'][inst] and index != -1:
+            if value == 1:
+                pos |= 1 << index
+            else:
+                neg |= 1 << index
+    return pos, neg
+
+# Candidate arguments for action schema of given arity, obtained by joining its positive preconditions,
+# given as pairs (pred, largs) as in ground, against the ground atoms in atoms_by_pred (map from preds
+# to lists of args). As in a Datalog engine, atoms over static predicates are joined first, and then by
+# increasing size of relation; each relation is indexed by the positions whose objects are known (either
+# constants or parameters bound by previous atoms). Parameters that don't appear in the preconditions
+# range over all objects. Only bindings of distinct objects in objects are materialized, and they are
+# returned in the order given by product(objects, repeat=arity).
+def join_bindings(precs: List[tuple], arity: int, atoms_by_pred: Dict, static_preds: set, objects: List[int]) -> List[tuple]:
+    allowed = set(objects)
+    precs = sorted(precs, key=lambda prec: (prec[0] not in static_preds, len(atoms_by_pred.get(prec[0], []))))
+    bindings = [ (None,) * arity ]
+    bound = set()
+    for pred, largs in precs:
+        key_positions = [ k for k, (i, _) in enumerate(largs) if i is None or i in bound ]
+        new_params = []
+        for i, _ in largs:
+            if i is not None and i not in bound and i not in new_params:
+                new_params.append(i)
+
+        # index relation by objects at key positions; values are objects for new parameters
+        index = dict()
+        for args in atoms_by_pred.get(pred, []):
+            if len(args) != len(largs): continue
+            values, consistent = dict(), True
+            for k, (i, _) in enumerate(largs):
+                if i is not None and i not in bound:
+                    if i not in values and args[k] in allowed:
+                        values[i] = args[k]
+                    elif values.get(i) != args[k]:
+                        consistent = False
+                        break
+            if consistent:
+                key = tuple([ args[k] for k in key_positions ])
+                if key not in index: index[key] = []
+                index[key].append(tuple([ values[i] for i in new_params ]))
+
+        # extend bindings, keeping only those with distinct objects
+        extended = []
+        for binding in bindings:
+            key = tuple([ obj if i is None else binding[i] for i, obj in [ largs[k] for k in key_positions ] ])
+            for values in index.get(key, []):
+                if len(set(values)) == len(values) and not set(values) & set(binding):
+                    extended_binding = list(binding)
+                    for i, obj in zip(new_params, values):
+                        extended_binding[i] = obj
+                    extended.append(tuple(extended_binding))
+        bindings = extended
+        bound.update(new_params)
+        if not bindings: return []
+
+    # remaining parameters range over all objects
+    free_params = [ i for i in range(arity) if i not in bound ]
+    if free_params:
+        extended = []
+        for binding in bindings:
+            for values in product(objects, repeat=len(free_params)):
+                if len(set(values)) == len(values) and not set(values) & set(binding):
+                    extended_binding = list(binding)
+                    for i, obj in zip(free_params, values):
+                        extended_binding[i] = obj
+                    extended.append(tuple(extended_binding))
+        bindings = extended
+
+    position = { obj: k for k, obj in enumerate(objects) }
+    return sorted(bindings, key=lambda binding: [ position[obj] for obj in binding ])
+
+# Index in CSR form (ptr, columns) for given rows and columns: the values in column k for row r are
+# columns[k][ptr[r]:ptr[r+1]], in the same order as they appear in the input
+def csr_index(num_rows: int, rows: List[int], columns: List[List[int]]) -> tuple:
+    rows = np.array(rows, dtype=np.int64)
+    order = np.argsort(rows, kind='stable')
+    ptr = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_rows), out=ptr[1:])
+    return ptr, [ np.array(column, dtype=np.int64)[order] for column in columns ]
+
+# Index that maps nodes to indices of ground actions applicable at them, in increasing order
+def appl_index(gactions_r: List[Dict], num_rows: int) -> Dict:
+    rows, ids = [], []
+    for i, gaction in enumerate(gactions_r):
+        rows.extend(gaction['appl'])
+        ids.extend([ i ] * len(gaction['appl']))
+    ptr, (ids,) = csr_index(num_rows, rows, [ ids ])
+    return dict(ptr=ptr, ids=ids)
+
+# Index that maps nodes to their outgoing edges, given as dict from labels to sets of edges (src, dst);
+# edges of each node are in the order given by iterating over labels and their edges
+def edge_index(tlabels: Dict, num_rows: int) -> Dict:
+    labels = list(tlabels.keys())
+    rows, label_ids, dsts = [], [], []
+    for k, label in enumerate(labels):
+        for src, dst in tlabels[label]:
+            rows.append(src)
+            label_ids.append(k)
+            dsts.append(dst)
+    ptr, (label_ids, dsts) = csr_index(num_rows, rows, [ label_ids, dsts ])
+    return dict(ptr=ptr, labels=labels, label_ids=label_ids, dsts=dsts)
+
+# Indices of ground actions applicable at node, using appl_index
+def applicable_actions(index: Dict, node: int) -> List[int]:
+    if node + 1 >= len(index['ptr']): return []
+    return index['ids'][index['ptr'][node]:index['ptr'][node+1]].tolist()
+
+# Outgoing edges (label, (node, dst)) of node, using edge_index
+def outgoing_edges(index: Dict, node: int) -> List[tuple]:
+    if node + 1 >= len(index['ptr']): return []
+    start, end = index['ptr'][node], index['ptr'][node+1]
+    return [ (index['labels'][k], (node, dst)) for k, dst in zip(index['label_ids'][start:end].tolist(), index['dsts'][start:end].tolist()) ]
+
+# Calculate nodes where given ground actions are applicable, assuming their static preconditions hold.
+# Node valuations form a boolean nodes x atoms matrix, and the indices of the positive and negative
+# dynamic preconditions of each action are padded with indices of two extra columns that are always
+# true and always false respectively. The nodes for a batch of actions are then obtained by all/any
+# reductions over the matrix indexed by the padded indices; batches hold at most max_batch_size cells.
+def applicable_nodes_numpy(ground_model: Dict, inst: int, gactions: List[Dict], max_batch_size: int = 1 << 24) -> None:
+    if not gactions: return
+    node_gatoms = ground_model['fval'][inst]['node']
+    nodes = np.array(list(node_gatoms.keys()), dtype=np.int64)
+    num_gatoms = len(ground_model['gatoms'][inst])
+    true_col, false_col = num_gatoms, num_gatoms + 1
+
+    counts = [ len(gatoms) for gatoms in node_gatoms.values() ]
+    rows = np.repeat(np.arange(len(nodes)), counts)
+    cols = np.fromiter(chain.from_iterable(node_gatoms.values()), dtype=np.intp, count=sum(counts))
+    valuations = np.zeros((len(nodes), num_gatoms + 2), dtype=bool)
+    valuations[rows, cols] = True
+    valuations[:, true_col] = True
+
+    f_static = ground_model['f_static'][inst]
+    pos_precs, neg_precs = [], []
+    for gaction in gactions:
+        dynamic = [ (index, value) for gprec, index, value in gaction['prec'] if gprec[0] not in f_static and index != -1 ]
+        pos_precs.append([ index for index, value in dynamic if value == 1 ])
+        neg_precs.append([ index for index, value in dynamic if value == 0 ])
+    max_pos = max([ len(precs) for precs in pos_precs ])
+    max_neg = max([ len(precs) for precs in neg_precs ])
+    pos_indices = np.array([ precs + [ true_col ] * (max_pos - len(precs)) for precs in pos_precs ], dtype=np.intp).reshape(len(gactions), max_pos)
+    neg_indices = np.array([ precs + [ false_col ] * (max_neg - len(precs)) for precs in neg_precs ], dtype=np.intp).reshape(len(gactions), max_neg)
+
+    batch_size = max(1, max_batch_size // max(1, len(nodes) * (max_pos + max_neg)))
+    for start in range(0, len(gactions), batch_size):
+        end = start + batch_size
+        appl = valuations[:, pos_indices[start:end]].all(axis=2) & ~valuations[:, neg_indices[start:end]].any(axis=2)
+        for gaction, mask in zip(gactions[start:end], appl.T):
+            gaction['appl'] = nodes[mask].tolist()
+
+# Check if dynamic predicates in given ground action hold in given node, using bitset for node
+def applicable_dynamic_bits(ground_model: Dict, inst: int, node_index: int, gaction: Dict) -> bool:
+    pos, neg = gaction['prec_bits']
+    bits = ground_model['fval'][inst]['bits'][node_index]
+    return bits & pos == pos and not bits & neg
+
 # Check if given ground action is aplicable in give node
 def applicable(ground_model: Dict, inst: int, node_index: int, gaction: Dict) -> bool:
-    return applicable_static(ground_model, inst, gaction) and applicable_dynamic(ground_model, inst, node_index, gaction)
+    if ground_model['node_repr'] == 'bitset':
+        return applicable_static(ground_model, inst, gaction) and applicable_dynamic_bits(ground_model, inst, node_index, gaction)
+    else:
+        return applicable_static(ground_model, inst, gaction) and applicable_dynamic(ground_model, inst, node_index, gaction)
 
 # Returns index of results node for grounded action applicable at src node
 # If grounded action leads to non-existent node, errors are logged
 def transition(ground_model: Dict, inst: int, src_index: int, gaction: Dict, f_nodes: Dict, f_nodes_r: Dict, logger, debug: bool = False) -> List:
+    if ground_model['node_repr'] == 'bitset':
+        return transition_bits(ground_model, inst, src_index, gaction, f_nodes, f_nodes_r, logger, debug)
     dst = set(f_nodes[src_index])
-    if debug: logger.debug(f'Src={src_index}.{dst}, gaction={gaction["label"]}{gaction["args"]}')
+    if debug: logger.debug(f'Src={src_index}.{dst}, gaction={gaction["label"]}{tuple(SYMBOLS.names(gaction["args"]))}')
     for gatom, index, value in gaction['eff']:
         assert gatom[0] in ground_model['pred']
         if index == -1:
             if value == 1:
-                logger.error(f'Inexistent ground atom {gatom} (add effect)')
+                logger.error(f'Inexistent ground atom {SYMBOLS.atom_names(*gatom)} (add effect)')
                 return -1
             else:
-                logger.warning(f'Inexistent ground atom {gatom} (del effect, issue warning)')
+                logger.warning(f'Inexistent ground atom {SYMBOLS.atom_names(*gatom)} (del effect, issue warning)')
         elif value == 0:
             if gatom[0] in ground_model['f_static'][inst] and index in ground_model['fval_static'][inst][1]:
-                logger.error(f'Trying to remove non-existent static atom {gatom}')
+                logger.error(f'Trying to remove non-existent static atom {SYMBOLS.atom_names(*gatom)}')
                 return -1
             elif gatom[0] not in ground_model['f_static'][inst] and index in dst:
-                if debug: logger.debug(f'Remove atom {index}.{gatom}')
+                if debug: logger.debug(f'Remove atom {index}.{SYMBOLS.atom_names(*gatom)}')
                 dst.remove(index)
         else:
             if gatom[0] in ground_model['f_static'][inst] and index not in ground_model['fval_static'][inst][1]:
-                logger.error(f'Trying to assert non-true static atom {index}.{gatom}')
+                logger.error(f'Trying to assert non-true static atom {index}.{SYMBOLS.atom_names(*gatom)}')
                 return -1
             elif gatom[0] not in ground_model['f_static'][inst] and index not in dst:
-                if debug: logger.debug(f'Assert atom {index}.{gatom}')
+                if debug: logger.debug(f'Assert atom {index}.{SYMBOLS.atom_names(*gatom)}')
                 dst.add(index)
     key = tuple(sorted(list(dst)))
     dst_index = -1 if key not in f_nodes_r else f_nodes_r[key]
     if debug:
-        dst_gatoms = [ ground_model['gatoms_r'][inst][i] for i in dst ]
+        dst_gatoms = [ SYMBOLS.atom_r_names(ground_model['gatoms_r'][inst][i]) for i in dst ]
         logger.debug(f'Dst={dst_index}.{dst}={dst_gatoms}')
     return dst_index
 
+# Same as transition, but nodes in f_nodes are bitsets and f_nodes_r is indexed by bitsets
+def transition_bits(ground_model: Dict, inst: int, src_index: int, gaction: Dict, f_nodes: Dict, f_nodes_r: Dict, logger, debug: bool = False) -> int:
+    dst = f_nodes[src_index]
+    if debug: logger.debug(f'Src={src_index}.{dst:b}, gaction={gaction["label"]}{tuple(SYMBOLS.names(gaction["args"]))}')
+    for gatom, index, value in gaction['eff']:
+        assert gatom[0] in ground_model['pred']
+        if index == -1:
+            if value == 1:
+                logger.error(f'Inexistent ground atom {SYMBOLS.atom_names(*gatom)} (add effect)')
+                return -1
+            else:
+                logger.warning(f'Inexistent ground atom {SYMBOLS.atom_names(*gatom)} (del effect, issue warning)')
+        elif value == 0:
+            if gatom[0] in ground_model['f_static'][inst] and index in ground_model['fval_static'][inst][1]:
+                logger.error(f'Trying to remove non-existent static atom {SYMBOLS.atom_names(*gatom)}')
+                return -1
+            elif gatom[0] not in ground_model['f_static'][inst]:
+                if debug and dst >> index & 1: logger.debug(f'Remove atom {index}.{SYMBOLS.atom_names(*gatom)}')
+                dst &= ~(1 << index)
+        else:
+            if gatom[0] in ground_model['f_static'][inst] and index not in ground_model['fval_static'][inst][1]:
+                logger.error(f'Trying to assert non-true static atom {index}.{SYMBOLS.atom_names(*gatom)}')
+                return -1
+            elif gatom[0] not in ground_model['f_static'][inst]:
+                if debug and not dst >> index & 1: logger.debug(f'Assert atom {index}.{SYMBOLS.atom_names(*gatom)}')
+                dst |= 1 << index
+    dst_index = f_nodes_r.get(dst, -1)
+    if debug:
+        dst_gatoms = [ SYMBOLS.atom_r_names(ground_model['gatoms_r'][inst][i]) for i in range(dst.bit_length()) if dst >> i & 1 ]
+        logger.debug(f'Dst={dst_index}.{dst:b}={dst_gatoms}')
+    return dst_index
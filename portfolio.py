@@ -0,0 +1,118 @@
+from pathlib import Path
+from queue import Queue
+from subprocess import Popen, PIPE
+from termcolor import colored
+from threading import Thread
+from timeit import default_timer as timer
+from typing import Dict, List, Optional, Tuple
+import json, os, signal
+
+# Portfolio of clingo configurations raced on the same iteration inputs.
+#
+# Each configuration is a string of clingo options that replaces the default '--sat-prepro=<n>' in
+# the solver command; the threads of the solver (at most one per cpu) are split evenly among the raced
+# configurations, and no more configurations than threads are raced.
+# The first configuration that proves optimality (or unsatisfiability) wins and the remaining ones
+# are killed. If none finishes before the time limit, the configuration with best optimization
+# vector wins. Wins are accumulated per domain in a JSON file, and the configurations with most wins
+# are selected first in later runs, so the portfolio gets pruned towards the best configurations for
+# each domain.
+
+PORTFOLIO = [
+    '--configuration=auto --opt-strategy=bb,lin --sat-prepro=0',
+    '--configuration=trendy --opt-strategy=usc,oll --sat-prepro=0',
+    '--configuration=crafty --opt-strategy=bb,hier --sat-prepro=1 --seed=1',
+    '--configuration=jumpy --opt-strategy=usc,one --sat-prepro=0 --seed=2',
+    '--configuration=handy --opt-strategy=bb,inc --sat-prepro=2 --seed=3',
+    '--configuration=tweety --opt-strategy=usc,k,0 --sat-prepro=0 --seed=4',
+]
+
+def load_stats(filename: Path) -> Dict:
+    if filename.exists():
+        with filename.open('r') as fd:
+            return json.load(fd)
+    return dict()
+
+def save_stats(filename: Path, stats: Dict) -> None:
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    tmp_filename = filename.with_name(f'{filename.name}.tmp{os.getpid()}')
+    with tmp_filename.open('w') as fd:
+        json.dump(stats, fd, indent=2)
+    os.replace(tmp_filename, filename)
+
+# Select size configurations, those with more wins first (ties broken by order in portfolio)
+def select_configurations(configurations: List[str], stats: Dict, size: int) -> List[str]:
+    ranked = sorted(configurations, key=lambda config: -stats.get(config, dict()).get('wins', 0))
+    return ranked[:size]
+
+# Kill process group of a child started with start_new_session (the group may be already gone)
+def kill_process_group(pgid: int) -> None:
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def _read_output(index: int, p: Popen, queue: Queue) -> None:
+    for line in p.stdout:
+        queue.put((index, line.strip('\n')))
+    queue.put((index, None))
+
+def _optimization(lines: List[str]) -> Optional[List[int]]:
+    costs = [ line for line in lines if line[:13] == 'Optimization:' ]
+    return [ int(n) for n in costs[-1][13:].split() ] if costs else None
+
+# Race solver commands (one per configuration), each in its own process group; processes are registered
+# in running_children, along with their process group ids, while they run. Returns dict with fields winner (index of winning configuration), lines (output of
+# winner), optimum (whether winner proved optimality), and times (wall time per configuration).
+def race(commands: List[str], running_children: List[Tuple[Popen, Optional[int]]], logger) -> Dict:
+    start_time = timer()
+    queue = Queue()
+    processes, readers = [], []
+    for index, cmd in enumerate(commands):
+        p = Popen(cmd, stdout=PIPE, shell=True, bufsize=1, universal_newlines=True, start_new_session=True)
+        running_children.append((p, p.pid))
+        processes.append(p)
+        readers.append(Thread(target=_read_output, args=(index, p, queue), daemon=True))
+        readers[-1].start()
+
+    lines = [ [] for _ in commands ]
+    times = [ None for _ in commands ]
+    proved = [ False for _ in commands ]
+    winner = None
+    while any([ t is None for t in times ]):
+        index, line = queue.get()
+        if line is None:
+            times[index] = timer() - start_time
+            if index == winner:
+                # winner is done; kill remaining configurations
+                for i, p in enumerate(processes):
+                    if times[i] is None:
+                        kill_process_group(p.pid)
+        else:
+            logger.info(f'[config {index}] {line}')
+            lines[index].append(line)
+            if winner is None and (line == 'OPTIMUM FOUND' or line == 'UNSATISFIABLE'):
+                logger.info(colored(f'Portfolio: config {index} finished first ({line})', 'green'))
+                winner = index
+                proved[index] = True
+
+    for p, reader in zip(processes, readers):
+        p.wait()
+        reader.join()
+        running_children.remove((p, p.pid))
+
+    if winner is None:
+        # best optimization vector at time limit; configurations without model lose
+        worst = [ float('inf') ]
+        winner = min(range(len(commands)), key=lambda i: (_optimization(lines[i]) or worst, i))
+    return dict(winner=winner, lines=lines[winner], optimum=proved[winner], times=times)
+
+# Record outcome of race in stats
+def update_stats(stats: Dict, configurations: List[str], result: Dict) -> None:
+    for index, config in enumerate(configurations):
+        entry = stats.setdefault(config, dict(runs=0, wins=0, optimum_wins=0, time=0.0))
+        entry['runs'] += 1
+        entry['time'] += result['times'][index]
+        if index == result['winner']:
+            entry['wins'] += 1
+            entry['optimum_wins'] += 1 if result['optimum'] else 0
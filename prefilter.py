@@ -0,0 +1,146 @@
+from pathlib import Path
+from termcolor import colored
+from timeit import default_timer as timer
+from typing import Dict, List, Optional
+
+import parse_and_ground as pg
+import distillate_cache as dc
+
+try:
+    import clingo
+    import clingo.ast
+except ImportError:
+    clingo = None
+
+# Prefilter of the features given to the solver.
+#
+# The solver chooses the predicates among the features that aren't nelegible (see nelegible/1 in
+# solver.lp), and the facts about the other features are only read to calculate nelegible/1. The
+# prefilter calculates these features in Python over the distillates of the graph files given to the
+# solver (see pg.prefilter_features), and gives the solver copies of the graph files without them. As
+# the nelegible features depend on all the graph files (e.g. on their constants), the copies are
+# rewritten when the set of graph files changes. The facts in the graph files and in their copies are
+# counted, and checked against the facts in their distillates.
+#
+# The prefilter is only sound for solvers that choose the predicates as solver.lp, which is checked
+# over the AST of the solver (it needs the Python module clingo).
+
+def available() -> bool:
+    return clingo is not None
+
+# Values of integer constants defined in statements of solver
+def solver_consts(statements: List) -> Dict[str, int]:
+    consts = dict()
+    for statement in statements:
+        if statement.ast_type == clingo.ast.ASTType.Definition and statement.value.ast_type == clingo.ast.ASTType.SymbolicTerm and statement.value.symbol.type == clingo.SymbolType.Number:
+            consts[statement.name] = statement.value.symbol.number
+    return consts
+
+# Argument of literal if it is an atom pred(X), and None otherwise
+def _pred_argument(literal):
+    if literal.ast_type == clingo.ast.ASTType.Literal and literal.atom.ast_type == clingo.ast.ASTType.SymbolicAtom:
+        symbol = literal.atom.symbol
+        if symbol.ast_type == clingo.ast.ASTType.Function and symbol.name == 'pred' and len(symbol.arguments) == 1:
+            return symbol.arguments[0]
+    return None
+
+# Check that the only rules of solver with pred/1 in their head are choice rules with elements
+# pred(X) : feature(X), not nelegible(X) (with conditions in any order), as in solver.lp. Returns
+# None if they are, and the reason otherwise.
+def check_pred_choice(statements: List) -> Optional[str]:
+    num_choices = 0
+    for statement in statements:
+        if statement.ast_type != clingo.ast.ASTType.Rule:
+            continue
+        head = statement.head
+        if head.ast_type in [ clingo.ast.ASTType.Aggregate, clingo.ast.ASTType.Disjunction ]:
+            elements = [ (element.literal, element.condition) for element in head.elements ]
+        elif head.ast_type == clingo.ast.ASTType.HeadAggregate:
+            elements = [ (element.condition.literal, element.condition.condition) for element in head.elements ]
+        else:
+            elements = [ (head, []) ]
+        for literal, condition in elements:
+            arg = _pred_argument(literal)
+            if arg is None:
+                continue
+            elif head.ast_type == clingo.ast.ASTType.Aggregate and literal.sign == clingo.ast.Sign.NoSign and arg.ast_type == clingo.ast.ASTType.Variable and \
+                 sorted([ str(lit) for lit in condition ]) == sorted([ f'feature({arg.name})', f'not nelegible({arg.name})' ]):
+                num_choices += 1
+            else:
+                return f"rule '{statement}' defines pred/1"
+    return None if num_choices > 0 else 'no choice rule for pred/1'
+
+# Number of facts in graph file
+def count_facts(filename: Path) -> int:
+    with filename.open('r') as fd:
+        return len([ line for line in fd if line.strip() and not line.startswith('%') ])
+
+class FeaturePrefilter:
+    # Check that solver chooses the predicates as solver.lp; reduced graph files are written in path
+    def __init__(self, solver: Path, path: Path, parser: str, distillate_cache: Optional[Path], logger):
+        assert available(), 'Python module clingo is not available'
+        statements = []
+        clingo.ast.parse_files([ str(solver) ], statements.append)
+        consts = solver_consts(statements)
+        reason = check_pred_choice(statements)
+        if reason is None and (consts.get('opt_synthesis') != 1 or consts.get('opt_testing', 0) >= 2):
+            reason = f"opt_synthesis={consts.get('opt_synthesis')} and opt_testing={consts.get('opt_testing', 0)}"
+        self.enabled = reason is None
+        self.fill_incomplete_valuations = consts.get('opt_fill_incomplete_valuations', 0) == 1
+        self.equal_objects = consts.get('opt_equal_objects', 0) == 1
+        self.path = path
+        self.parser = parser
+        self.distillate_cache = distillate_cache
+        self.logger = logger
+        self.distillates = dict()
+        self.written = dict()
+        self.num_facts = []
+        self.num_removed = []
+        if not self.enabled:
+            self.logger.warning(colored(f"Prefilter: solver {solver} doesn't choose predicates as solver.lp ({reason}); prefilter disabled", 'magenta'))
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.logger.info(f'Prefilter: path={self.path}, fill_incomplete_valuations={self.fill_incomplete_valuations}, equal_objects={self.equal_objects}')
+
+    def _distillate(self, fname: Path) -> Dict:
+        key = fname.stat().st_mtime_ns
+        if fname not in self.distillates or self.distillates[fname][0] != key:
+            if self.distillate_cache is not None:
+                distillate = dc.load_distillate(fname, self.distillate_cache, self.logger, parser=self.parser)
+            else:
+                distillate = pg.parse_graph_file(fname, self.logger, parser=self.parser)
+            self.distillates[fname] = (key, distillate)
+        return self.distillates[fname][1]
+
+    # Files for a solver call given files: the graph files (files other than dynamic_files) are replaced
+    # by their copies without the features that the solver can't choose
+    def inputs(self, files: List[Path], dynamic_files: List[Path]) -> List[Path]:
+        if not self.enabled:
+            return files
+        start_time = timer()
+        graph_files = [ fname for fname in files if fname not in dynamic_files ]
+        distillates = [ self._distillate(fname) for fname in graph_files ]
+        features = pg.prefilter_features(distillates, self.fill_incomplete_valuations, self.equal_objects)
+
+        num_facts, num_reduced_facts, reduced_files = 0, 0, []
+        for fname, distillate in zip(graph_files, distillates):
+            reduced_fname = self.path / fname.name
+            key = (self.distillates[fname][0], frozenset(features))
+            if fname not in self.written or self.written[fname][0] != key or not reduced_fname.exists():
+                reduced = pg.remove_features(distillate, features)
+                pg.write_graph_file_from_distillate(reduced_fname, reduced, self.logger)
+                counts = (count_facts(fname), count_facts(reduced_fname))
+                assert counts[1] == pg.graph_fact_count(reduced), f"{colored('ERROR:', 'red')} prefiltered file '{reduced_fname}' has {counts[1]} fact(s); expected {pg.graph_fact_count(reduced)}"
+                if counts[0] != pg.graph_fact_count(distillate):
+                    self.logger.warning(colored(f"Prefilter: '{fname}' has {counts[0]} fact(s) and its distillate {pg.graph_fact_count(distillate)} (duplicate facts?)", 'magenta'))
+                self.written[fname] = (key, counts)
+            num_facts += self.written[fname][1][0]
+            num_reduced_facts += self.written[fname][1][1]
+            reduced_files.append(reduced_fname)
+
+        num_features = len(set([ feature for distillate in distillates for feature in distillate['feature'] ]))
+        saved = num_facts - num_reduced_facts
+        self.num_facts.append((num_facts, num_reduced_facts))
+        self.num_removed.append(len(features))
+        self.logger.info(f'Prefilter: #features={num_features}, #removed={len(features)}, #facts={num_facts}, #reduced_facts={num_reduced_facts}, saved={saved} ({100 * saved / max(1, num_facts):.1f}%), elapsed_time={timer() - start_time:.3f}')
+        return reduced_files + [ fname for fname in files if fname in dynamic_files ]
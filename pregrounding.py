@@ -0,0 +1,175 @@
+from hashlib import sha256
+from pathlib import Path
+from termcolor import colored
+from timeit import default_timer as timer
+from typing import List, Optional, Set, Tuple
+import os
+
+from distillate_cache import file_hash
+
+try:
+    import clingo
+    import clingo.ast
+except ImportError:
+    clingo = None
+
+# Pregrounding of the part of the solver program that depends only on the graph files.
+#
+# The solver program is split with a dependency analysis over its AST. A predicate is dynamic if it is
+# given by partial.lp (relevant/2, partial/2, filename/1), it is external, it is defined by a rule that
+# is not normal (e.g. choice rules), or it is defined by a rule whose body mentions a dynamic predicate.
+# The normal rules that define the other (static) predicates form the bottom of a splitting set that
+# includes the facts in the graph files. If the bottom has a unique stable model, that model can be given
+# as facts, in place of the graph files, to the rest of the program (the residual program), which has
+# the same stable models as the whole program for the same inputs (splitting set theorem).
+#
+# The model of the bottom is computed once per set of graph files (and constants), and it is cached in
+# a file named after the SHA-256 hash of the solver, the graph files, and the constants. Solver calls
+# get the residual program, the cached model, and the files with relevant nodes (partial.lp) and
+# heuristics.
+
+CACHE_VERSION = 1
+
+# Predicates given by partial.lp; they change in each iteration
+DYNAMIC_SIGNATURES = set([ ('relevant', 2), ('partial', 2), ('filename', 1) ])
+
+def available() -> bool:
+    return clingo is not None
+
+def _signature(atom) -> Optional[Tuple[str, int]]:
+    if atom.ast_type == clingo.ast.ASTType.SymbolicAtom:
+        symbol = atom.symbol
+        if symbol.ast_type == clingo.ast.ASTType.Function:
+            return (symbol.name, len(symbol.arguments))
+        elif symbol.ast_type == clingo.ast.ASTType.SymbolicTerm and symbol.symbol.type == clingo.SymbolType.Function:
+            return (symbol.symbol.name, len(symbol.symbol.arguments))
+    return None
+
+class _SignatureCollector(clingo.ast.Transformer if clingo is not None else object):
+    def __init__(self):
+        self.signatures = set()
+
+    def visit_SymbolicAtom(self, atom):
+        signature = _signature(atom)
+        if signature is not None:
+            self.signatures.add(signature)
+        return atom
+
+# Signatures of atoms defined by head of rule that isn't normal (not the ones in conditions)
+def _head_signatures(head) -> Set[Tuple[str, int]]:
+    if head.ast_type in [ clingo.ast.ASTType.Aggregate, clingo.ast.ASTType.Disjunction ]:
+        return _signatures([ element.literal for element in head.elements ])
+    elif head.ast_type == clingo.ast.ASTType.HeadAggregate:
+        return _signatures([ element.condition.literal for element in head.elements ])
+    else:
+        return _signatures([ head ])
+
+def _signatures(nodes) -> Set[Tuple[str, int]]:
+    collector = _SignatureCollector()
+    for node in nodes:
+        collector(node)
+    return collector.signatures
+
+# Split statements of program into static rules and residual statements; returns the static rules, the
+# residual statements, and the static signatures
+def split_program(statements: List) -> Tuple[List, List, Set[Tuple[str, int]]]:
+    # normal rules and constraints (head None) with signatures in their bodies
+    rules = []
+    dynamic = set(DYNAMIC_SIGNATURES)
+    for statement in statements:
+        if statement.ast_type == clingo.ast.ASTType.Rule:
+            head = statement.head
+            if head.ast_type == clingo.ast.ASTType.Literal and head.atom.ast_type == clingo.ast.ASTType.BooleanConstant:
+                rules.append((statement, None, _signatures(statement.body)))
+            elif head.ast_type == clingo.ast.ASTType.Literal and head.sign == clingo.ast.Sign.NoSign and _signature(head.atom) is not None:
+                rules.append((statement, _signature(head.atom), _signatures(statement.body)))
+            else:
+                dynamic.update(_head_signatures(head))
+        elif statement.ast_type == clingo.ast.ASTType.External:
+            dynamic.update(_signatures([ statement.atom ]))
+
+    changed = True
+    while changed:
+        changed = False
+        for rule, head, body in rules:
+            if head is not None and head not in dynamic and not body.isdisjoint(dynamic):
+                dynamic.add(head)
+                changed = True
+
+    static_rules = [ rule for rule, head, body in rules if head is not None and head not in dynamic ]
+    static_signatures = set([ head for rule, head, body in rules if head is not None and head not in dynamic ])
+    residual = [ statement for statement in statements if not any([ statement is rule for rule in static_rules ]) ]
+    return static_rules, residual, static_signatures
+
+def _key(files: List[Path], consts: List[str]) -> str:
+    digest = sha256()
+    for fname in files:
+        digest.update(f'{fname.name}:{file_hash(fname)}\n'.encode())
+    for const in consts:
+        digest.update(f'{const}\n'.encode())
+    return f'{digest.hexdigest()}_c{CACHE_VERSION}'
+
+class Pregrounder:
+    # Split solver program and write residual program in cache path; consts are the -c arguments
+    # (name=value) given to the solver
+    def __init__(self, solver: Path, consts: List[str], cache_path: Path, logger):
+        assert available(), 'Python module clingo is not available'
+        self.solver = solver
+        self.consts = consts
+        self.cache_path = cache_path
+        self.logger = logger
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self.num_grounded = 0
+        self.num_reused = 0
+        self.ground_time = 0
+
+        statements = []
+        clingo.ast.parse_files([ str(solver) ], statements.append)
+        static_rules, residual, self.static_signatures = split_program(statements)
+        self.static_program = '\n'.join([ str(statement) for statement in statements if statement.ast_type == clingo.ast.ASTType.Definition ] + [ str(rule) for rule in static_rules ])
+        self.residual = self.cache_path / f'residual_{_key([ solver ], [])}_{solver.name}'
+        if not self.residual.exists():
+            self._write(self.residual, '\n'.join([ str(statement) for statement in residual ]) + '\n')
+        signatures = ', '.join([ f'{name}/{arity}' for name, arity in sorted(self.static_signatures) ])
+        self.logger.info(f'Pregrounding: #static_rules={len(static_rules)}, #residual_statements={len(residual)}, static={signatures}, residual={self.residual}')
+
+    def _write(self, filename: Path, text: str) -> None:
+        # written in temporary file which is then renamed, so that files are never partially written
+        tmp_filename = filename.with_name(f'.{filename.name}.tmp{os.getpid()}')
+        tmp_filename.write_text(text)
+        os.replace(tmp_filename, filename)
+
+    # Unique stable model of static rules and graph files as facts, or None if there isn't a unique one
+    def _ground(self, graph_files: List[Path]) -> Optional[str]:
+        arguments = [ item for const in self.consts for item in [ '-c', const ] ] + [ '--models=2' ]
+        control = clingo.Control(arguments, logger=lambda code, message: None)
+        for fname in graph_files:
+            control.load(str(fname))
+        control.add('base', [], self.static_program)
+        control.ground([ ('base', []) ])
+        models = []
+        control.solve(on_model=lambda model: models.append(model.symbols(atoms=True)))
+        if len(models) != 1:
+            return None
+        return ''.join([ f'{symbol}.\n' for symbol in models[0] ])
+
+    # Solver and files for a solver call given by solver and files: if the graph files (files other than
+    # dynamic_files) have a pregrounded model, the residual program and the files with the model and the
+    # dynamic files; otherwise, solver and files
+    def inputs(self, files: List[Path], dynamic_files: List[Path]) -> Tuple[Path, List[Path]]:
+        graph_files = [ fname for fname in files if fname not in dynamic_files ]
+        static_fname = self.cache_path / f'static_{_key([ self.solver ] + graph_files, self.consts)}.lp'
+        if not static_fname.exists():
+            start_time = timer()
+            facts = self._ground(graph_files)
+            if facts is None:
+                self.logger.warning(colored(f'Pregrounding: no unique model for static part of {self.solver} on {len(graph_files)} graph file(s); using whole program', 'magenta'))
+                return self.solver, files
+            self._write(static_fname, facts)
+            self.num_grounded += 1
+            self.ground_time += timer() - start_time
+            self.logger.info(f'Pregrounding: static model for {len(graph_files)} graph file(s) written to {static_fname}, #facts={facts.count(chr(10))}, elapsed_time={timer() - start_time:.3f}')
+        else:
+            self.num_reused += 1
+            self.logger.info(f'Pregrounding: static model for {len(graph_files)} graph file(s) read from {static_fname}')
+        return self.residual, [ static_fname ] + [ fname for fname in files if fname in dynamic_files ]
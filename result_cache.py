@@ -0,0 +1,84 @@
+from hashlib import sha256
+from pathlib import Path
+from shutil import copy as file_copy
+from shutil import rmtree
+from typing import Dict, List, Optional
+from termcolor import colored
+import json, os
+
+from distillate_cache import file_hash
+
+# Persistent cache of solver results.
+#
+# Each entry is a folder named after the SHA-256 hash of a solver call: the content of the solver and
+# of each input file (in the order given to the solver), the constants and options given to Clingo,
+# and the cache version. The folder contains the best model (best_model.lp; missing if no model was
+# found), the text appended to the readable models (readable_models.txt), and result.json with the
+# status, optimization value, and timings of the call. Entries are written in a temporary folder that
+# is then renamed, so that they are never partially written.
+#
+# The cache is bounded in size: when it exceeds the limit, the least recently used entries are
+# removed, where the time of use of an entry is the modification time of its result.json (which is
+# touched on each hit).
+
+CACHE_VERSION = 1
+
+def call_key(files: List[Path], arguments: List[str]) -> str:
+    digest = sha256()
+    for fname in files:
+        digest.update(f'{fname.name}:{file_hash(fname)}\n'.encode())
+    for argument in arguments:
+        digest.update(f'{argument}\n'.encode())
+    return f'{digest.hexdigest()}_c{CACHE_VERSION}'
+
+# Return entry for key if stored in cache, or None
+def lookup(cache_path: Path, key: str) -> Optional[Path]:
+    entry = cache_path / key
+    return entry if (entry / 'result.json').is_file() else None
+
+# Copy best model of entry to best_model_filename and append its readable model to
+# readable_models_filename; return result of entry
+def load_result(entry: Path, best_model_filename: Path, readable_models_filename: Path) -> Dict:
+    with (entry / 'result.json').open('r') as fd:
+        result = json.load(fd)
+    if (entry / 'best_model.lp').is_file():
+        file_copy(entry / 'best_model.lp', best_model_filename)
+    if (entry / 'readable_models.txt').is_file():
+        with readable_models_filename.open('a') as fd:
+            fd.write((entry / 'readable_models.txt').read_text())
+    os.utime(entry / 'result.json')
+    return result
+
+def store_result(cache_path: Path, key: str, best_model_filename: Path, readable_text: str, result: Dict) -> None:
+    # write entry in temporary folder which is then renamed, so that entries are never partially written
+    entry = cache_path / key
+    tmp_entry = entry.with_name(f'{entry.name}.tmp{os.getpid()}')
+    tmp_entry.mkdir(parents=True, exist_ok=True)
+    if best_model_filename.is_file():
+        file_copy(best_model_filename, tmp_entry / 'best_model.lp')
+    (tmp_entry / 'readable_models.txt').write_text(readable_text)
+    with (tmp_entry / 'result.json').open('w') as fd:
+        json.dump(result, fd, indent=2)
+    try:
+        tmp_entry.rename(entry)
+    except OSError:
+        # entry stored concurrently by other process
+        rmtree(tmp_entry, ignore_errors=True)
+
+def entry_size(entry: Path) -> int:
+    return sum([ fname.stat().st_size for fname in entry.iterdir() if fname.is_file() ])
+
+# Remove least recently used entries until the size of the cache is at most max_size (MB)
+def evict(cache_path: Path, max_size: int, logger) -> None:
+    entries = [ entry for entry in cache_path.iterdir() if (entry / 'result.json').is_file() ]
+    sizes = { entry: entry_size(entry) for entry in entries }
+    total_size = sum(sizes.values())
+    entries.sort(key=lambda entry: (entry / 'result.json').stat().st_mtime)
+    num_evicted = 0
+    while entries and total_size > max_size * 1024 * 1024:
+        entry = entries.pop(0)
+        rmtree(entry, ignore_errors=True)
+        total_size -= sizes[entry]
+        num_evicted += 1
+    if num_evicted > 0:
+        logger.info(colored(f'Result cache: {num_evicted} entry(ies) evicted from {cache_path}, size={total_size / (1024 * 1024):.1f}MB', 'magenta'))
@@ -0,0 +1,63 @@
+from typing import List
+
+# Symbol table that interns names (predicates, objects) and ground atoms into dense integers. A ground
+# atom is a pair (pred, args) of the index of the predicate and the tuple of indices of the objects;
+# nullary atoms are kept with the args given in the graph file (e.g. ('null',)). The table is shared
+# by all distillates and ground models in the process (see SYMBOLS below), and names are recovered
+# only for logging and for writing files.
+
+class SymbolTable:
+    def __init__(self):
+        self.symbols = dict()
+        self.symbols_r = []
+        self.atoms = dict()
+        self.atoms_r = []
+
+    def __len__(self):
+        return len(self.symbols_r)
+
+    def symbol(self, name: str) -> int:
+        index = self.symbols.get(name)
+        if index is None:
+            index = self.symbols[name] = len(self.symbols_r)
+            self.symbols_r.append(name)
+        return index
+
+    def atom(self, pred: int, args: tuple) -> int:
+        key = (pred, args)
+        index = self.atoms.get(key)
+        if index is None:
+            index = self.atoms[key] = len(self.atoms_r)
+            self.atoms_r.append(key)
+        return index
+
+    def atom_from_names(self, pred: str, args: tuple) -> int:
+        return self.atom(self.symbol(pred), tuple([ self.symbol(arg) for arg in args ]))
+
+    # Index of atom if registered, or -1
+    def find_atom(self, pred: int, args: tuple) -> int:
+        return self.atoms.get((pred, args), -1)
+
+    def name(self, symbol: int) -> str:
+        return self.symbols_r[symbol]
+
+    def names(self, symbols) -> List[str]:
+        return [ self.symbols_r[symbol] for symbol in symbols ]
+
+    # Atom (pred, args) given by indices as pair of names
+    def atom_names(self, pred: int, args: tuple) -> tuple:
+        return (self.symbols_r[pred], tuple([ self.symbols_r[arg] for arg in args ]))
+
+    # Registered atom as pair of names
+    def atom_r_names(self, atom: int) -> tuple:
+        return self.atom_names(*self.atoms_r[atom])
+
+    # Replace contents of the table by those of given table (e.g. read from a checkpoint), which must
+    # extend it so that the symbols and atoms already interned keep their indices
+    def restore(self, table: 'SymbolTable') -> None:
+        assert self.symbols_r == table.symbols_r[:len(self.symbols_r)], 'Restored symbol table does not extend current symbols'
+        assert self.atoms_r == table.atoms_r[:len(self.atoms_r)], 'Restored symbol table does not extend current atoms'
+        self.symbols, self.symbols_r = table.symbols, table.symbols_r
+        self.atoms, self.atoms_r = table.atoms, table.atoms_r
+
+SYMBOLS = SymbolTable()
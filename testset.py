@@ -0,0 +1,186 @@
+from collections import OrderedDict
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from termcolor import colored
+from timeit import default_timer as timer
+from typing import Dict, List, Optional, Set
+import multiprocessing as mp
+import gc, signal
+
+import parse_and_ground as pg
+import distillate_cache as dc
+from verifier import verify_ground_model
+
+# Test set of graph files that is read once per run: sizes are computed once, files are ordered by
+# size, and each distillate is parsed (or loaded from the distillate cache) the first time it is
+# requested and kept resident for the remaining learning iterations. When the available memory drops
+# below min_free_memory (MB), the least recently used distillates are spilled to disk (the distillate
+# cache if given, otherwise a temporary folder) and loaded back from there when needed again.
+#
+# A lifted model is verified over the test set either sequentially in the driver process, or
+# concurrently in a pool of forked processes. The pool is created once per run, after all the
+# distillates are made resident in the driver (as many as memory allows; the others are spilled), so
+# the workers inherit them through fork and never parse graph files. In both cases, results are
+# reported in test-set order (smallest file first), so a consumer that stops at the first failing file
+# sees the same failure in both modes.
+
+def size_lp_file(fname: Path) -> int:
+    size = 0
+    with fname.open('r') as fd:
+        for line in fd:
+            if line[:5] == 'node(':
+                size += 1
+    return size
+
+# Test set and current verification (generation) shared with verification workers; set by the driver
+# before forking the pool
+_g_verify_test_set = None
+_g_verify_generation = None
+
+def _init_verify_worker() -> None:
+    # workers are terminated by the driver when the run ends
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def _verify_file(test_set, fname: Path, distillate: Dict, lifted_model: Dict, ground_options: Dict) -> Dict:
+    start_time = timer()
+    ground_model = pg.ground(lifted_model, distillate, test_set.logger, **ground_options)
+    inst, unverified_nodes = verify_ground_model(ground_model, test_set.logger)
+    sinks = pg.read_sink_nodes(distillate, test_set.logger)
+    return dict(fname=fname, inst=inst, unverified_nodes=unverified_nodes, sinks=sinks, verify_time=timer() - start_time)
+
+# Verify file in worker; files of a verification whose consumer stopped iterating (stale generation)
+# are skipped
+def _verify_file_in_worker(fname: Path, generation: int, lifted_model: Dict, ground_options: Dict) -> Optional[Dict]:
+    if generation != _g_verify_generation.value:
+        return None
+    test_set = _g_verify_test_set
+    return _verify_file(test_set, fname, test_set.load(fname), lifted_model, ground_options)
+
+# Available memory in MB, or None if it cannot be determined
+def available_memory() -> Optional[int]:
+    try:
+        with open('/proc/meminfo', 'r') as fd:
+            for line in fd:
+                if line[:13] == 'MemAvailable:':
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+class TestSet:
+    def __init__(self, files: List[Path], parser: str, distillate_cache: Optional[Path], min_free_memory: int, logger):
+        self.parser = parser
+        self.distillate_cache = distillate_cache
+        self.min_free_memory = min_free_memory
+        self.logger = logger
+        self.sizes = { fname: size_lp_file(fname) for fname in files }
+        self.files = sorted(files, key=lambda fname: self.sizes[fname])
+        self.resident = OrderedDict()
+        self.spilled = set()
+        self.spill_folder = None
+        self.num_loads = 0
+        self.num_spills = 0
+        self.pool = None
+        logger.info(f'Test set: {len(self.files)} file(s), sizes={[ self.sizes[fname] for fname in self.files ]}')
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
+
+    def _spill_path(self) -> Path:
+        if self.distillate_cache is not None:
+            return self.distillate_cache
+        if self.spill_folder is None:
+            self.spill_folder = TemporaryDirectory(prefix='spilled_distillates_')
+        return Path(self.spill_folder.name)
+
+    def _spill(self, fname: Path, distillate: Dict) -> None:
+        # with a distillate cache, the distillate was already stored when it was loaded
+        entry = self._spill_path() / dc.cache_key(fname)
+        if not entry.is_dir():
+            dc.store_entry(entry, dc.encode_distillate(distillate))
+        self.spilled.add(fname)
+        self.num_spills += 1
+        self.logger.info(colored(f"Low memory: distillate for '{fname.name}' spilled to {entry}", 'magenta'))
+
+    def _make_room(self) -> None:
+        free = available_memory()
+        while self.resident and free is not None and free < self.min_free_memory:
+            fname, distillate = self.resident.popitem(last=False)
+            self._spill(fname, distillate)
+            del distillate
+            gc.collect()
+            free = available_memory()
+
+    # Return distillate for fname without making it resident
+    def load(self, fname: Path) -> Dict:
+        if fname in self.resident:
+            return self.resident[fname]
+        elif fname in self.spilled:
+            distillate = dc.load_distillate(fname, self._spill_path(), self.logger, parser=self.parser)
+        elif self.distillate_cache is not None:
+            distillate = dc.load_distillate(fname, self.distillate_cache, self.logger, parser=self.parser)
+        else:
+            distillate = pg.parse_graph_file(fname, self.logger, parser=self.parser)
+        self.num_loads += 1
+        return distillate
+
+    # Return distillate for fname, loading it if it isn't resident
+    def distillate(self, fname: Path) -> Dict:
+        if fname in self.resident:
+            self.resident.move_to_end(fname)
+            return self.resident[fname]
+
+        self._make_room()
+        distillate = self.load(fname)
+        self.resident[fname] = distillate
+        return distillate
+
+    # Pool of verification workers, created the first time it is needed: distillates are made resident
+    # before forking, so that the workers inherit them
+    def _pool(self, jobs: int):
+        global _g_verify_test_set, _g_verify_generation
+        if self.pool is None:
+            for fname in self.files:
+                self.distillate(fname)
+            context = mp.get_context('fork')
+            _g_verify_test_set = self
+            _g_verify_generation = context.Value('l', 0, lock=False)
+            self.pool = context.Pool(min(jobs, len(self.files)), initializer=_init_verify_worker)
+            self.logger.info(f'Verification pool: #jobs={min(jobs, len(self.files))}, {self.stats()}')
+        return self.pool
+
+    # Terminate pool of verification workers (if any)
+    def close(self) -> None:
+        global _g_verify_test_set, _g_verify_generation
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+            _g_verify_test_set, _g_verify_generation = None, None
+
+    # Verify lifted model over test set, yielding one result per file in test-set order. With jobs > 1,
+    # files are verified concurrently in the pool of verification workers: files are dispatched largest
+    # first (to balance the load) and, when the consumer stops iterating, the remaining ones are skipped
+    # by the workers. Files in skip (already verified for this model) aren't verified. Each result is a
+    # dict with fields fname, inst, unverified_nodes, sinks, and verify_time.
+    def verify(self, lifted_model: Dict, jobs: int = 1, skip: Set[Path] = frozenset(), **ground_options):
+        files = [ fname for fname in self.files if fname not in skip ]
+        if jobs <= 1 or len(files) <= 1:
+            for fname in files:
+                yield _verify_file(self, fname, self.distillate(fname), lifted_model, ground_options)
+        else:
+            pool = self._pool(jobs)
+            generation = _g_verify_generation.value
+            try:
+                pending = { fname: pool.apply_async(_verify_file_in_worker, (fname, generation, lifted_model, ground_options)) for fname in reversed(files) }
+                for fname in files:
+                    yield pending[fname].get()
+            finally:
+                # also when the consumer stops iterating (generator closed) or on exceptions
+                _g_verify_generation.value = generation + 1
+
+    def stats(self) -> str:
+        return f'#files={len(self.files)}, #resident={len(self.resident)}, #loads={self.num_loads}, #spills={self.num_spills}'
@@ -0,0 +1,175 @@
+from itertools import product
+from math import ceil
+from pathlib import Path
+from subprocess import run, PIPE, STDOUT
+from sys import argv, executable
+from tempfile import TemporaryDirectory
+from termcolor import colored
+from timeit import default_timer as timer
+from typing import Dict, List
+import argparse, json, logging, random
+
+from incremental_solver import get_logger
+
+# Offline tuner of Clingo options for a domain.
+#
+# The incremental driver is run once on the domain with its default options, recording the solver
+# inputs of each iteration (--record_inputs). Candidate configurations (combinations of options from
+# the search space) are then evaluated on the recorded iterations by successive halving: in each
+# round, the surviving candidates are run on a larger set of iterations (the first and the later,
+# larger ones) with a larger time limit, and only the best 1/eta of them survive. A candidate is
+# scored by total wall time, where runs that don't prove optimality are charged penalty * time
+# limit. The best candidate is written as a JSON file that is loaded with
+# 'incremental_solver.py --clingo_config'.
+
+DEFAULT_SEARCH_SPACE = {
+    '--configuration': [ 'auto', 'trendy', 'crafty', 'jumpy', 'handy', 'tweety' ],
+    '--opt-strategy': [ 'bb,lin', 'bb,hier', 'bb,inc', 'usc,oll', 'usc,one', 'usc,k,0' ],
+    '--sat-prepro': [ '0', '1', '2' ],
+    '-t': [ '1', '2', '4', '6' ],
+}
+
+def candidates_from_search_space(search_space: Dict[str, List[str]], num_candidates: int) -> List[Dict[str, str]]:
+    options = sorted(search_space.keys())
+    candidates = [ dict(zip(options, values)) for values in product(*[ search_space[option] for option in options ]) ]
+    if 0 < num_candidates < len(candidates):
+        candidates = random.sample(candidates, num_candidates)
+    return candidates
+
+def candidate_string(candidate: Dict[str, str]) -> str:
+    return ' '.join([ f'{option}={value}' if option[:2] == '--' else f'{option} {value}' for option, value in candidate.items() ])
+
+def record_inputs(solver: Path, domain: Path, inputs_path: Path, driver_args: List[str], logger) -> None:
+    with TemporaryDirectory(prefix='tune_results_') as results:
+        cmd = [ executable, 'incremental_solver.py', str(solver), str(domain), '--results', results, '--record_inputs', str(inputs_path) ] + driver_args
+        logger.info(f'Recording solver inputs: cmd={" ".join(cmd)}')
+        start_time = timer()
+        output = run(cmd, stdout=PIPE, stderr=STDOUT, universal_newlines=True)
+        logger.info(f'Driver finished with status {output.returncode}, elapsed_time={timer() - start_time:.3f}')
+
+# Run candidate on iteration inputs; return pair (solved, wall time)
+def run_candidate(candidate: Dict[str, str], iteration: Path, solver_name: str, consts: List[str], time_limit: int, logger) -> tuple:
+    files = sorted([ fname for fname in iteration.iterdir() if fname.name != solver_name ])
+    cmd = f'clingo {" ".join(consts)} --fast-exit {candidate_string(candidate)} --time-limit={time_limit} --stats=0 {iteration / solver_name} {" ".join([ str(fname) for fname in files ])}'
+    logger.info(f'Cmd={cmd}')
+    start_time = timer()
+    output = run(cmd, shell=True, stdout=PIPE, stderr=STDOUT, universal_newlines=True)
+    elapsed_time = timer() - start_time
+    lines = output.stdout.split('\n')
+    solved = 'OPTIMUM FOUND' in lines or 'UNSATISFIABLE' in lines
+    logger.info(f'    {iteration.name}: solved={solved}, elapsed_time={elapsed_time:.3f}, returncode={output.returncode}')
+    return solved, elapsed_time
+
+# Successive halving over candidates; iterations are sorted from first to last
+def successive_halving(candidates: List[Dict[str, str]], iterations: List[Path], solver_name: str, consts: List[str], min_time: int, eta: int, penalty: float, logger) -> List[Dict]:
+    num_rounds = 1
+    while eta ** num_rounds < len(candidates):
+        num_rounds += 1
+    survivors = [ dict(candidate=candidate, score=0.0, solved=0, runs=0) for candidate in candidates ]
+    time_limit = min_time
+    for r in range(num_rounds):
+        # first iteration is always used; the remaining ones are taken from the last (larger) iterations
+        num_iterations = min(len(iterations), max(1, ceil(len(iterations) * (r + 1) / num_rounds)))
+        selected = sorted(set([ iterations[0] ] + iterations[len(iterations) - num_iterations + 1:]))
+        logger.info(colored(f'Round {r}: #candidates={len(survivors)}, #iterations={len(selected)}, time_limit={time_limit}', 'blue', attrs=['bold']))
+        for entry in survivors:
+            entry.update(score=0.0, solved=0, runs=0)
+            for iteration in selected:
+                solved, elapsed_time = run_candidate(entry['candidate'], iteration, solver_name, consts, time_limit, logger)
+                entry['score'] += elapsed_time if solved else penalty * time_limit
+                entry['solved'] += 1 if solved else 0
+                entry['runs'] += 1
+            logger.info(f"  {candidate_string(entry['candidate'])}: score={entry['score']:.3f}, solved={entry['solved']}/{entry['runs']}")
+        survivors.sort(key=lambda entry: entry['score'])
+        if r + 1 < num_rounds:
+            survivors = survivors[:max(1, len(survivors) // eta)]
+            time_limit *= 2
+    return survivors
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(description='Offline tuning of Clingo options for incremental learning of grounded PDDL models')
+
+    # required arguments
+    required = parser.add_argument_group('required arguments')
+    required.add_argument('solver', type=str, help='solver (.lp file)')
+    required.add_argument('domain', type=str, help='path to folder containing graphs (it can be path to .zip file)')
+
+    # hyperparameters for solver
+    default_max_action_arity = 3
+    default_max_num_predicates = 12
+    hyper = parser.add_argument_group('hyperparameters for solver')
+    hyper.add_argument('--max_action_arity', type=int, default=default_max_action_arity, help=f'set maximum action arity for schemas (default={default_max_action_arity})')
+    hyper.add_argument('--max_num_predicates', type=int, default=default_max_num_predicates, help=f'set maximum number selected predicates (default={default_max_num_predicates})')
+
+    # options for tuner
+    default_driver_max_time = 600
+    default_eta = 2
+    default_min_time = 30
+    default_num_candidates = 16
+    default_penalty = 2.0
+    tuner = parser.add_argument_group('optional arguments for tuner')
+    tuner.add_argument('--driver_max_time', type=int, default=default_driver_max_time, help=f'max-time for Clingo solver when recording inputs (default={default_driver_max_time})')
+    tuner.add_argument('--eta', type=int, default=default_eta, help=f'fraction 1/eta of candidates kept in each round (default={default_eta})')
+    tuner.add_argument('--inputs', type=Path, default=None, help='folder with recorded solver inputs; recorded by running driver if missing (default=temporary folder)')
+    tuner.add_argument('--min_time', type=int, default=default_min_time, help=f'time limit for runs in first round, doubled in each round (default={default_min_time})')
+    tuner.add_argument('--num_candidates', type=int, default=default_num_candidates, help=f'number of candidates sampled from search space (0=all, default={default_num_candidates})')
+    tuner.add_argument('--output', type=Path, default=None, help="JSON file for recommended configuration (default=clingo_config_<domain>.json)")
+    tuner.add_argument('--penalty', type=float, default=default_penalty, help=f'score of unsolved runs as multiple of time limit (default={default_penalty})')
+    tuner.add_argument('--search_space', type=Path, default=None, help='JSON file mapping Clingo options to lists of values (default=built-in search space)')
+
+    # random number generator
+    default_seed = 0
+    rng = parser.add_argument_group('random number generator')
+    rng.add_argument('--seed', type=int, default=default_seed, help=f'seed for random generator (default={default_seed})')
+
+    args = parser.parse_args()
+    return args
+
+if __name__ == '__main__':
+    args = _parse_arguments()
+    random.seed(args.seed)
+    solver = Path(args.solver)
+    domain = Path(args.domain)
+    domain_name = domain.name[:-len(domain.suffix)] if domain.suffix == '.zip' else domain.name
+    output = args.output if args.output is not None else Path(f'clingo_config_{domain_name}.json')
+    logger = get_logger('tune', '', logging.INFO)
+    logger.info(f'Call: {" ".join(argv)}')
+
+    # record solver inputs of each iteration of the driver
+    tmp_inputs = None
+    inputs_path = args.inputs
+    if inputs_path is None:
+        tmp_inputs = TemporaryDirectory(prefix='tune_inputs_')
+        inputs_path = Path(tmp_inputs.name)
+    if not inputs_path.exists() or not any(inputs_path.iterdir()):
+        driver_args = [ '--max_action_arity', str(args.max_action_arity), '--max_num_predicates', str(args.max_num_predicates), '--max_time', str(args.driver_max_time) ]
+        record_inputs(solver, domain, inputs_path, driver_args, logger)
+    iterations = sorted([ path for path in inputs_path.iterdir() if path.is_dir() and path.name[:10] == 'iteration_' ])
+    if not iterations:
+        logger.error(f'No recorded solver inputs in {inputs_path}')
+        exit(-1)
+    logger.info(f'{len(iterations)} recorded iteration(s) in {inputs_path}')
+
+    # search space and candidates
+    search_space = DEFAULT_SEARCH_SPACE
+    if args.search_space is not None:
+        with args.search_space.open('r') as fd:
+            search_space = json.load(fd)
+    candidates = candidates_from_search_space(search_space, args.num_candidates)
+    logger.info(f'{len(candidates)} candidate(s) from search space {search_space}')
+
+    # successive halving, and recommended configuration
+    consts = [ f'-c max_action_arity={args.max_action_arity}', f'-c num_predicates={args.max_num_predicates}' ]
+    ranking = successive_halving(candidates, iterations, solver.name, consts, args.min_time, args.eta, args.penalty, logger)
+    best = dict(ranking[0]['candidate'])
+    threads = int(best.pop('-t', '6'))
+    config = dict(domain=domain_name,
+                  solver=solver.name,
+                  threads=threads,
+                  options=candidate_string(best),
+                  score=ranking[0]['score'],
+                  solved=f"{ranking[0]['solved']}/{ranking[0]['runs']}",
+                  ranking=[ dict(options=candidate_string(entry['candidate']), score=entry['score']) for entry in ranking ])
+    with output.open('w') as fd:
+        json.dump(config, fd, indent=2)
+    logger.info(colored(f"Recommended configuration for {domain_name}: threads={threads}, options='{config['options']}' (score={config['score']:.3f}); written to {output}", 'green', attrs=['bold']))